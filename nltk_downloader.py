@@ -11,11 +11,12 @@ print(f"使用数据目录: {nltk_data_path}")
 
 # 验证所有资源
 resources = ['punkt', 'stopwords', 'wordnet', 'averaged_perceptron_tagger']
+# 资源所在子目录，未列出的资源均位于 corpora/
+PREFIXES = {'punkt': 'tokenizers/', 'averaged_perceptron_tagger': 'taggers/'}
 all_available = True
 
 for resource in resources:
-    path_prefix = 'tokenizers/' if resource == 'punkt' else 'corpora/'
-    path_prefix = 'taggers/' if resource == 'averaged_perceptron_tagger' else path_prefix
+    path_prefix = PREFIXES.get(resource, 'corpora/')
     
     try:
         nltk.data.find(f'{path_prefix}{resource}')
@@ -1,10 +1,82 @@
 # self_correction/config.py
 
+import functools
 import os
-import yaml
-from typing import Dict, Any, List, Optional
+import pickle
+import re
+import sys
+import types
+from typing import Dict, Any, List, Mapping, Optional, Pattern, Tuple
 from .prompt_templates import PromptStrategy, DEFAULT_PROMPT_TEMPLATES, DEFAULT_FEW_SHOT_EXAMPLES
 
+# orjson 解析大文件明显快于标准库；两者的 loads 均接受 bytes
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+# 数值型环境变量：(环境变量名, 配置属性名, 类型转换)
+ENV_NUMERIC = [
+    ('QWEN_TEMPERATURE', 'llm_temperature', float),
+    ('QWEN_MAX_TOKENS', 'llm_max_tokens', int),
+    ('QWEN_TIMEOUT_SECONDS', 'llm_timeout_seconds', int),
+    ('QWEN_MAX_RETRIES', 'llm_max_retries', int),
+]
+
+def _intern_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """将 schema 中的 db_id、表名与列名字符串驻留，多份配置/多进程间共享同一份对象"""
+    schema['db_id'] = sys.intern(schema['db_id'])
+    for key in ('table_names', 'table_names_original'):
+        if key in schema:
+            schema[key] = [sys.intern(name) for name in schema[key]]
+    for key in ('column_names', 'column_names_original'):
+        if key in schema:
+            schema[key] = [[table_id, sys.intern(name)] for table_id, name in schema[key]]
+    return schema
+
+@functools.lru_cache(maxsize=8)
+def _load_tables(tables_path: str, db_root: str) -> Tuple[Mapping[str, Any], Mapping[str, str]]:
+    """
+    加载 tables_for_natsql 文件，构建 db_id -> schema 与 db_id -> sqlite 路径两个映射。
+    同一进程内按 (tables_path, db_root) 只加载一次；返回只读映射，供所有配置实例共享。
+    """
+    try:
+        f = open(tables_path, 'rb')
+    except FileNotFoundError:
+        return types.MappingProxyType({}), types.MappingProxyType({})
+
+    with f:
+        # 解析结果缓存为同目录下的 pickle 文件，按源文件 mtime 判断是否过期
+        st = os.fstat(f.fileno())
+        cache_path = tables_path + ".pkl"
+        # 缓存读取或解包的任何失败（协议不支持、结构不符等）都只视为未命中，回退解析 JSON
+        try:
+            with open(cache_path, 'rb') as cache_f:
+                cached_mtime, cached_root, schema_dict, db_path_dict = pickle.load(cache_f)
+            if cached_mtime == st.st_mtime and cached_root == db_root:
+                return types.MappingProxyType(schema_dict), types.MappingProxyType(db_path_dict)
+        except Exception:
+            pass
+        tables = _json_loads(f.read())
+
+    schema_dict = {t['db_id']: t for t in map(_intern_schema, tables)}
+    # SQLite 在 POSIX 与 Windows 上都接受正斜杠路径
+    db_path_dict = {db_id: f"{db_root}/{db_id}/{db_id}.sqlite" for db_id in schema_dict}
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    # 缓存是可选的：写入失败只打印警告，并清理残留的临时文件
+    try:
+        with open(tmp_path, 'wb') as cache_f:
+            pickle.dump((st.st_mtime, db_root, schema_dict, db_path_dict), cache_f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        print(f"[WARN] Failed to write tables cache {cache_path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    return types.MappingProxyType(schema_dict), types.MappingProxyType(db_path_dict)
+
 class SelfCorrectionConfig:
     """
     Configuration class for the Self-Correction Module.
@@ -27,6 +99,12 @@ class SelfCorrectionConfig:
         self.llm_stop_sequences: List[str] = ["#;\n\n", "\n\n---", "---\n"]
         self.llm_timeout_seconds: int = 120
         self.llm_max_retries: int = 5
+        self.llm_stream: bool = False
+        self.llm_prompt_cache_control: bool = False
+        self.max_workers: int = 16
+        self.llm_batch_size: int = 1
+        # 对判定为无需修正的SQL随机抽样修正的概率（探索模式），默认关闭
+        self.exploration_rate: float = 0.0
         self.prompt_templates: Dict[str, str] = {}
         self.few_shot_examples: Optional[List[Dict[str, Any]]] = None
         self.log_dir: str = "./correction_logs_qwen3"
@@ -45,39 +123,38 @@ class SelfCorrectionConfig:
         if not self.prompt_templates:
             self._set_default_prompt_templates()
 
+        # 停止序列在进程生命周期内不变，预编译为单个正则供每次API调用复用
+        stops = [seq for seq in self.llm_stop_sequences if seq]
+        self.llm_stop_re: Optional[Pattern[str]] = re.compile("|".join(map(re.escape, stops))) if stops else None
+
         # === 自动加载 schema_dict 和 db_path_dict ===
-        import json
         tables_path = "data/preprocessed_data/test_tables_for_natsql.json"
         db_root = "database"
-        schema_dict = {}
-        db_path_dict = {}
-        if os.path.exists(tables_path):
-            with open(tables_path, 'r', encoding='utf-8') as f:
-                tables = json.load(f)
-                for t in tables:
-                    db_id = t['db_id']
-                    schema_dict[db_id] = t
-                    db_path_dict[db_id] = os.path.join(db_root, db_id, f"{db_id}.sqlite")
-        self.schema_dict = schema_dict
-        self.db_path_dict = db_path_dict
+        self.schema_dict, self.db_path_dict = _load_tables(tables_path, db_root)
         self.db_path = db_root  # 兜底用
 
-        # Basic validation
+        # Basic validation — 仅记录问题，推迟到首次真正使用LLM时再报错，
+        # 便于测试和工具在没有API配置的情况下构造并查看配置
+        self._init_errors: List[str] = []
         if not self.llm_api_key:
-            raise ValueError("LLM API Key is not configured. Set QWEN_API_KEY environment variable or configure in YAML.")
+            self._init_errors.append("LLM API Key is not configured. Set QWEN_API_KEY environment variable or configure in YAML.")
         if not self.llm_api_endpoint:
-            raise ValueError("LLM API Endpoint is not configured. Set QWEN_API_ENDPOINT environment variable or configure in YAML.")
+            self._init_errors.append("LLM API Endpoint is not configured. Set QWEN_API_ENDPOINT environment variable or configure in YAML.")
         if not self.prompt_templates:
-            raise ValueError("Prompt templates could not be loaded or defaulted.")
+            self._init_errors.append("Prompt templates could not be loaded or defaulted.")
 
         # Ensure log directory is an absolute path
         self.log_dir = os.path.abspath(self.log_dir)
 
     def _load_from_yaml(self, config_path: str):
         """Load configuration from a YAML file."""
+        # 仅在使用 YAML 配置时才导入 yaml，避免拖慢只依赖环境变量的进程启动
+        import yaml
+        # 优先使用 libyaml 的 C 解析器，未编译 libyaml 时回退到纯 Python 实现
+        loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
         try:
             with open(config_path, 'r', encoding='utf-8') as f:
-                config_data = yaml.safe_load(f)
+                config_data = yaml.load(f, Loader=loader)
 
             if not config_data:
                 return
@@ -92,12 +169,20 @@ class SelfCorrectionConfig:
             self.llm_stop_sequences = llm_settings.get('stop_sequences', self.llm_stop_sequences)
             self.llm_timeout_seconds = llm_settings.get('timeout_seconds', self.llm_timeout_seconds)
             self.llm_max_retries = llm_settings.get('max_retries', self.llm_max_retries)
+            self.llm_stream = llm_settings.get('stream', self.llm_stream)
+            self.llm_prompt_cache_control = llm_settings.get('prompt_cache_control', self.llm_prompt_cache_control)
+            self.max_workers = llm_settings.get('max_workers', self.max_workers)
+            self.llm_batch_size = llm_settings.get('batch_size', self.llm_batch_size)
 
             # Prompt Settings
             prompt_settings = config_data.get('prompt_settings', {})
             self.prompt_templates = prompt_settings.get('templates', self.prompt_templates)
             self.few_shot_examples = prompt_settings.get('few_shot_examples', self.few_shot_examples)
 
+            # Correction Settings
+            correction_settings = config_data.get('correction_settings', {})
+            self.exploration_rate = correction_settings.get('exploration_rate', self.exploration_rate)
+
             # Logging Settings
             log_settings = config_data.get('logging_settings', {})
             self.log_dir = log_settings.get('log_dir', self.log_dir)
@@ -119,33 +204,13 @@ class SelfCorrectionConfig:
         self.llm_model_name = os.environ.get('QWEN_MODEL_NAME', self.llm_model_name)
         
         # LLM parameters
-        temp_str = os.environ.get('QWEN_TEMPERATURE')
-        if temp_str:
-            try:
-                self.llm_temperature = float(temp_str)
-            except ValueError:
-                print(f"[WARN] Invalid value for QWEN_TEMPERATURE: {temp_str}. Using default.")
-
-        max_tokens_str = os.environ.get('QWEN_MAX_TOKENS')
-        if max_tokens_str:
-            try:
-                self.llm_max_tokens = int(max_tokens_str)
-            except ValueError:
-                print(f"[WARN] Invalid value for QWEN_MAX_TOKENS: {max_tokens_str}. Using default.")
-
-        timeout_str = os.environ.get('QWEN_TIMEOUT_SECONDS')
-        if timeout_str:
-            try:
-                self.llm_timeout_seconds = int(timeout_str)
-            except ValueError:
-                print(f"[WARN] Invalid value for QWEN_TIMEOUT_SECONDS: {timeout_str}. Using default.")
-
-        max_retries_str = os.environ.get('QWEN_MAX_RETRIES')
-        if max_retries_str:
-            try:
-                self.llm_max_retries = int(max_retries_str)
-            except ValueError:
-                print(f"[WARN] Invalid value for QWEN_MAX_RETRIES: {max_retries_str}. Using default.")
+        for env_name, attr, cast in ENV_NUMERIC:
+            value = os.environ.get(env_name)
+            if value:
+                try:
+                    setattr(self, attr, cast(value))
+                except ValueError:
+                    print(f"[WARN] Invalid value for {env_name}: {value}. Using default.")
 
         # Other settings
         log_dir_env = os.environ.get('CORRECTION_LOG_DIR')
@@ -163,6 +228,16 @@ class SelfCorrectionConfig:
         if self.few_shot_examples is None:
             self.few_shot_examples = DEFAULT_FEW_SHOT_EXAMPLES.copy()
 
+    def ensure_ready(self):
+        """
+        确认构造时记录的必需配置均已提供，否则抛出异常。
+
+        Raises:
+            ValueError: 缺少API Key、Endpoint或Prompt模板。
+        """
+        if self._init_errors:
+            raise ValueError(" ".join(self._init_errors))
+
     def validate_config(self) -> bool:
         """验证配置是否完整和有效"""
         errors = []
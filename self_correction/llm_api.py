@@ -1,24 +1,132 @@
 # self_correction/llm_api.py
 
+import concurrent.futures
+import functools
+import random
+import re
 import requests
+from requests.adapters import HTTPAdapter
 import json
+import math
 import time
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Callable, Iterator, List, Mapping, Optional, Pattern, Tuple
 
 logger = logging.getLogger(__name__)
 
+# orjson 直接输出 bytes 且明显快于标准库 json 编码
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 安装了 httpx[http2] 时改用 HTTP/2，使并发请求复用同一个TLS连接
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+_TIMEOUT_ERRORS = (requests.exceptions.Timeout,) + ((httpx.TimeoutException,) if httpx else ())
+_REQUEST_ERRORS = (requests.exceptions.RequestException,) + ((httpx.HTTPError,) if httpx else ())
+_HTTP_STATUS_ERRORS = (requests.exceptions.HTTPError,) + ((httpx.HTTPStatusError,) if httpx else ())
+
+_DASHSCOPE_SYSTEM_PROMPT = "You are a helpful assistant that corrects SQL queries based on natural language questions and database schemas."
+_OPENAI_SYSTEM_PROMPT = "You are a helpful assistant that corrects SQL queries based on natural language questions and database schemas. Always provide clear, executable SQL as your response."
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+def _dumps(payload: Dict[str, Any]) -> bytes:
+    """将请求体序列化为JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload).encode("utf-8")
+
 class LLMError(Exception):
     """Custom exception for LLM API errors."""
     pass
 
+@functools.lru_cache(maxsize=32)
+def _compile_stop_pattern(stop_sequences: Tuple[str, ...]) -> Optional[Pattern[str]]:
+    """将停止序列编译为单个交替正则，按停止序列元组缓存"""
+    stops = [seq for seq in stop_sequences if seq]
+    if not stops:
+        return None
+    return re.compile("|".join(map(re.escape, stops)))
+
+def _resolve_stop_pattern(stop_sequences: Optional[List[str]],
+                          stop_pattern: Optional[Pattern[str]] = None) -> Optional[Pattern[str]]:
+    """优先使用调用方预编译的停止序列正则，否则按停止序列列表编译（带缓存）"""
+    if stop_pattern is not None or not stop_sequences:
+        return stop_pattern
+    return _compile_stop_pattern(tuple(stop_sequences))
+
+def _truncate_at_stop(text: str, stop_pattern: Optional[Pattern[str]]) -> str:
+    """在最早出现的停止序列处截断文本，一次扫描完成"""
+    if stop_pattern is None:
+        return text
+    m = stop_pattern.search(text)
+    return text[:m.start()] if m else text
+
+def _backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0,
+                   headers: Optional[Mapping[str, str]] = None) -> float:
+    """
+    计算重试前的等待时间。服务端给出 Retry-After 时优先遵循（截断到 [0, cap]），
+    否则在 [0, min(cap, base * 2^attempt)] 内随机取值，避免多个worker同时重试。
+    """
+    retry_after = headers.get("Retry-After") if headers is not None else None
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            delay = None  # HTTP-date 格式的 Retry-After 不做解析
+        # 负数、nan/inf 等非法值忽略；过大的值截断，避免长时间阻塞worker
+        if delay is not None and math.isfinite(delay):
+            return min(max(delay, 0.0), cap)
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def _response_headers(error: Exception) -> Optional[Mapping[str, str]]:
+    """取出异常所携带HTTP响应的headers（若有）"""
+    response = getattr(error, "response", None)
+    return response.headers if response is not None else None
+
+def _iter_sse_data(lines) -> Iterator[str]:
+    """从SSE响应行中逐条取出 data: 字段内容，遇到 [DONE] 结束"""
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        if data:
+            yield data
+
+def _dashscope_stream_delta(chunk: Dict[str, Any]) -> str:
+    """提取DashScope增量输出事件中的新增文本"""
+    output = chunk.get("output")
+    if output is None:
+        raise LLMError(f"DashScope API error: {chunk.get('message', chunk)}")
+    if "text" in output:
+        return output["text"] or ""
+    choices = output.get("choices") or []
+    return (choices[0].get("message", {}).get("content") or "") if choices else ""
+
+def _openai_stream_delta(chunk: Dict[str, Any]) -> str:
+    """提取OpenAI兼容流式事件中的新增文本"""
+    if "error" in chunk:
+        raise LLMError(f"OpenAI-compatible API error: {chunk['error']}")
+    choices = chunk.get("choices") or []
+    return (choices[0].get("delta", {}).get("content") or "") if choices else ""
+
 class QwenAPIClient:
     """
     封装与QWEN 2.5turbo API的交互逻辑。
     兼容阿里云DashScope API和其他OpenAI-compatible API。
     """
     def __init__(self, api_key: str, endpoint: str, model: str = "qwen3:14b", 
-                 timeout: int = 60, max_retries: int = 3):
+                 timeout: int = 60, max_retries: int = 3, stream: bool = False,
+                 cache_control: bool = False, max_concurrency: int = 16):
         """
         初始化Qwen API客户端。
 
@@ -28,6 +136,10 @@ class QwenAPIClient:
             model (str): 要使用的模型名称。
             timeout (int): 请求超时时间（秒）。
             max_retries (int): 最大重试次数。
+            stream (bool): 是否以流式方式接收响应，命中停止序列时提前结束读取。
+            cache_control (bool): OpenAI兼容API下，是否将Prompt静态前缀标记为
+                                  cache_control: ephemeral 以显式启用服务端前缀缓存。
+            max_concurrency (int): get_corrections 批量提交时同时在途的最大请求数。
         """
         if not api_key:
             raise ValueError("API Key is not provided.")
@@ -39,33 +151,102 @@ class QwenAPIClient:
         self.model = model
         self.timeout = timeout
         self.max_retries = max_retries
+        self.stream = stream
+        self.cache_control = cache_control
         
-        # 根据endpoint判断API类型
-        if "dashscope.aliyuncs.com" in endpoint.lower():
-            self.api_type = "dashscope"
-            self.headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-        elif "chat/completions" in endpoint.lower() or "v1/" in endpoint.lower():
-            # OpenAI兼容API (包括自部署的API)
-            self.api_type = "openai_compatible"
-            self.headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-        else:
-            # 默认使用OpenAI兼容格式
-            self.api_type = "openai_compatible"
-            self.headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
+        # 根据endpoint判断API类型；非DashScope的endpoint（包括自部署API）均按OpenAI兼容格式处理
+        endpoint_lower = endpoint.lower()
+        self.api_type = "dashscope" if "dashscope.aliyuncs.com" in endpoint_lower else "openai_compatible"
+        self.headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+
+        # 每次请求不变的系统消息只构造一次
+        self._system_msg_dash = {"role": "system", "content": _DASHSCOPE_SYSTEM_PROMPT}
+        self._system_msg_oai = {"role": "system", "content": _OPENAI_SYSTEM_PROMPT}
+
+        self._http2_client = None
+        if httpx is not None:
+            try:
+                self._http2_client = httpx.Client(http2=True, timeout=self.timeout, headers=self.headers)
+            except ImportError:
+                # 未安装h2时httpx无法启用HTTP/2，继续使用requests
+                logger.debug("httpx is installed without HTTP/2 support; using requests.")
+
+        # 没有HTTP/2客户端时复用同一个 Session，使 HTTPS 连接通过 keep-alive 在多次调用间保持
+        self._session = None
+        if self._http2_client is None:
+            self._session = requests.Session()
+            self._session.headers.update(self.headers)
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(32, max_concurrency), max_retries=0)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+            
+        # 批量提交共用的长期线程池，限制全部批次合计的在途请求数
+        self._batch_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, max_concurrency), thread_name_prefix="llm-batch"
+        )
             
         logger.info(f"QwenAPIClient initialized for {self.api_type} API: {self.endpoint} using model: {self.model}")
 
+    def close(self):
+        """关闭批量线程池与底层HTTP连接池"""
+        self._batch_executor.shutdown(wait=True)
+        if self._http2_client is not None:
+            self._http2_client.close()
+        if self._session is not None:
+            self._session.close()
+
+    def _post(self, payload: Dict[str, Any]):
+        """发送请求体，优先走HTTP/2客户端；两种响应对象均提供status_code/raise_for_status/json"""
+        body = _dumps(payload)
+        if self._http2_client is not None:
+            return self._http2_client.post(self.endpoint, content=body)
+        return self._session.post(self.endpoint, data=body, timeout=self.timeout)
+
+    def _post_stream(self, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> Iterator[str]:
+        """以流式方式发送请求，逐条产出SSE事件的data内容；提前停止迭代会关闭连接"""
+        body = _dumps(payload)
+        if self._http2_client is not None:
+            with self._http2_client.stream("POST", self.endpoint, content=body, headers=headers) as response:
+                response.raise_for_status()
+                yield from _iter_sse_data(response.iter_lines())
+        else:
+            with self._session.post(self.endpoint, data=body, headers=headers,
+                                    timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                yield from _iter_sse_data(response.iter_lines())
+
+    def _stream_completion(self, payload: Dict[str, Any], stop_sequences: List[str],
+                           stop_pattern: Optional[Pattern[str]],
+                           extract_delta: Callable[[Dict[str, Any]], str],
+                           headers: Optional[Dict[str, str]] = None) -> str:
+        """累积流式输出，一旦出现停止序列立即截断并结束读取"""
+        pattern = stop_pattern
+        # 停止序列可能跨越两个增量片段，每次从上一段末尾回退最长停止序列长度开始搜索；
+        # 只有预编译正则而不知道停止序列时，从头搜索
+        overlap = max(len(seq) for seq in stop_sequences) - 1 if stop_sequences else None
+        text = ""
+        events = self._post_stream(payload, headers)
+        try:
+            for data in events:
+                delta = extract_delta(_loads(data))
+                if not delta:
+                    continue
+                search_from = max(0, len(text) - overlap) if overlap is not None else 0
+                text += delta
+                if pattern is not None:
+                    m = pattern.search(text, search_from)
+                    if m:
+                        return text[:m.start()].strip()
+        finally:
+            events.close()
+        return text.strip()
+
     def get_correction(self, prompt: str, temperature: float, max_tokens: int, 
-                      stop_sequences: List[str]) -> str:
+                      stop_sequences: List[str], stop_pattern: Optional[Pattern[str]] = None,
+                      prompt_prefix: Optional[str] = None) -> str:
         """
         向Qwen API发送请求，获取修正后的SQL。
 
@@ -74,6 +255,8 @@ class QwenAPIClient:
             temperature (float): 控制生成随机性。
             max_tokens (int): 最大生成Token数量。
             stop_sequences (List[str]): 停止生成序列列表。
+            stop_pattern (Optional[Pattern[str]]): 预编译的停止序列正则，提供时不再按stop_sequences编译。
+            prompt_prefix (Optional[str]): prompt中对多次请求保持不变的前缀，用于服务端前缀缓存。
 
         Returns:
             str: LLM返回的原始文本响应。
@@ -81,39 +264,89 @@ class QwenAPIClient:
         Raises:
             LLMError: 如果API调用失败或返回错误。
         """
+        stop_pattern = _resolve_stop_pattern(stop_sequences, stop_pattern)
         for attempt in range(self.max_retries + 1):
             try:
                 if self.api_type == "dashscope":
-                    return self._call_dashscope_api(prompt, temperature, max_tokens, stop_sequences)
+                    return self._call_dashscope_api(prompt, temperature, max_tokens, stop_sequences, stop_pattern)
                 else:
-                    return self._call_openai_compatible_api(prompt, temperature, max_tokens, stop_sequences)
+                    return self._call_openai_compatible_api(prompt, temperature, max_tokens, stop_sequences,
+                                                            stop_pattern, prompt_prefix)
                     
-            except requests.exceptions.Timeout:
+            except _TIMEOUT_ERRORS:
                 logger.warning(f"API request timeout (attempt {attempt + 1}/{self.max_retries + 1})")
                 if attempt == self.max_retries:
                     raise LLMError(f"API request timed out after {self.max_retries + 1} attempts")
-                time.sleep(2 ** attempt)  # Exponential backoff
+                time.sleep(_backoff_delay(attempt))
                 
-            except requests.exceptions.RequestException as e:
+            except _REQUEST_ERRORS as e:
                 if "rate limit" in str(e).lower() or "429" in str(e):
                     logger.warning(f"Rate limit hit (attempt {attempt + 1}/{self.max_retries + 1})")
                     if attempt == self.max_retries:
                         raise LLMError(f"Rate limit exceeded after {self.max_retries + 1} attempts")
-                    time.sleep(5 * (attempt + 1))  # Longer wait for rate limits
+                    time.sleep(_backoff_delay(attempt, base=5.0, cap=120.0, headers=_response_headers(e)))  # Longer wait for rate limits
                 else:
                     logger.error(f"API request failed: {e}")
                     if attempt == self.max_retries:
                         raise LLMError(f"API request failed: {e}")
-                    time.sleep(2 ** attempt)
+                    time.sleep(_backoff_delay(attempt, headers=_response_headers(e)))
 
-    def _call_dashscope_api(self, prompt: str, temperature: float, max_tokens: int, 
-                           stop_sequences: List[str]) -> str:
-        """调用阿里云DashScope API"""
-        payload = {
+            except ValueError as e:
+                # 响应体不是合法JSON（httpx 的 response.json() 或流式事件解析），按请求失败重试
+                logger.error(f"Invalid API response: {e}")
+                if attempt == self.max_retries:
+                    raise LLMError(f"Invalid API response: {e}")
+                time.sleep(_backoff_delay(attempt))
+
+    def get_corrections(self, prompts: List[str], temperature: float, max_tokens: int,
+                        stop_sequences: List[str], stop_pattern: Optional[Pattern[str]] = None,
+                        prompt_prefixes: Optional[List[Optional[str]]] = None,
+                        return_exceptions: bool = False) -> List[str]:
+        """
+        批量获取修正结果：每个Prompt交给客户端共享的线程池调用 get_correction，
+        复用同一组 keep-alive/HTTP2 连接，流式读取、前缀缓存与重试策略与单条调用一致；
+        所有调用方合计的在途请求数不超过 max_concurrency。
+
+        Args:
+            prompts (List[str]): Prompt列表。
+            temperature (float): 控制生成随机性。
+            max_tokens (int): 最大生成Token数量。
+            stop_sequences (List[str]): 停止生成序列列表。
+            stop_pattern (Optional[Pattern[str]]): 预编译的停止序列正则。
+            prompt_prefixes (Optional[List[Optional[str]]]): 与prompts一一对应的静态前缀，用于服务端前缀缓存。
+            return_exceptions (bool): 为True时单个请求的异常作为结果返回，不影响其他请求。
+
+        Returns:
+            List[str]: 与prompts一一对应的原始文本响应。
+        """
+        stop_pattern = _resolve_stop_pattern(stop_sequences, stop_pattern)
+        if prompt_prefixes is None:
+            prompt_prefixes = [None] * len(prompts)
+        futures = [
+            self._batch_executor.submit(self.get_correction, prompt, temperature, max_tokens,
+                                        stop_sequences, stop_pattern, prefix)
+            for prompt, prefix in zip(prompts, prompt_prefixes)
+        ]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                if not return_exceptions:
+                    for pending in futures:
+                        pending.cancel()
+                    raise
+                results.append(e)
+        return results
+
+    def _build_dashscope_payload(self, prompt: str, temperature: float, max_tokens: int) -> Dict[str, Any]:
+        """构造DashScope API请求体"""
+        # DashScope可能不支持stop_sequences，需要在响应处理中手动处理
+        return {
             "model": self.model,
             "input": {
                 "messages": [
-                    {"role": "system", "content": "You are a helpful assistant that corrects SQL queries based on natural language questions and database schemas."},
+                    self._system_msg_dash,
                     {"role": "user", "content": prompt}
                 ]
             },
@@ -124,15 +357,11 @@ class QwenAPIClient:
                 "repetition_penalty": 1.0
             }
         }
-        
-        # DashScope可能不支持stop_sequences，需要在响应处理中手动处理
-        
-        logger.debug(f"Sending DashScope API request: {json.dumps(payload, indent=2)[:500]}...")
-        response = requests.post(self.endpoint, headers=self.headers, json=payload, timeout=self.timeout)
-        response.raise_for_status()
 
-        response_data = response.json()
-        logger.debug(f"Received DashScope API response: {json.dumps(response_data, indent=2)[:500]}...")
+    def _parse_dashscope_response(self, response_data: Dict[str, Any], stop_pattern: Optional[Pattern[str]]) -> str:
+        """从DashScope API响应中提取生成内容"""
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Received DashScope API response: {json.dumps(response_data, indent=2)[:500]}...")
 
         # 修复：DashScope API成功时直接返回结果，没有status_code字段
         if "output" in response_data:
@@ -150,9 +379,7 @@ class QwenAPIClient:
                 generated_content = str(output)
                 
             # 手动处理stop_sequences
-            for stop_seq in stop_sequences:
-                if stop_seq in generated_content:
-                    generated_content = generated_content.split(stop_seq)[0]
+            generated_content = _truncate_at_stop(generated_content, stop_pattern)
                     
             request_id = response_data.get("request_id", "N/A")
             logger.info(f"DashScope API call successful. Request ID: {request_id}")
@@ -167,12 +394,42 @@ class QwenAPIClient:
             # 未知响应格式
             raise LLMError(f"Unexpected DashScope response structure: {response_data}")
 
-    def _call_openai_compatible_api(self, prompt: str, temperature: float, max_tokens: int, 
-                                  stop_sequences: List[str]) -> str:
-        """调用OpenAI兼容的API（包括自部署API）"""
+    def _call_dashscope_api(self, prompt: str, temperature: float, max_tokens: int, 
+                           stop_sequences: List[str], stop_pattern: Optional[Pattern[str]] = None) -> str:
+        """调用阿里云DashScope API"""
+        payload = self._build_dashscope_payload(prompt, temperature, max_tokens)
+        if self.stream:
+            payload["parameters"]["incremental_output"] = True
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Sending DashScope API request: {json.dumps(payload, indent=2)[:500]}...")
+        if self.stream:
+            generated_content = self._stream_completion(
+                payload, stop_sequences, stop_pattern, _dashscope_stream_delta,
+                headers={"X-DashScope-SSE": "enable"}
+            )
+            logger.info("DashScope API streaming call successful.")
+            return generated_content
+
+        response = self._post(payload)
+        response.raise_for_status()
+
+        return self._parse_dashscope_response(response.json(), stop_pattern)
+
+    def _build_openai_payload(self, prompt: str, temperature: float, max_tokens: int,
+                              stop_sequences: List[str], prompt_prefix: Optional[str] = None) -> Dict[str, Any]:
+        """构造OpenAI兼容API请求体"""
+        if self.cache_control and prompt_prefix and prompt.startswith(prompt_prefix):
+            # 静态前缀单独作为一个内容块并标记为可缓存
+            content = [
+                {"type": "text", "text": prompt_prefix, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": prompt[len(prompt_prefix):]}
+            ]
+        else:
+            content = prompt
         messages = [
-            {"role": "system", "content": "You are a helpful assistant that corrects SQL queries based on natural language questions and database schemas. Always provide clear, executable SQL as your response."},
-            {"role": "user", "content": prompt}
+            self._system_msg_oai,
+            {"role": "user", "content": content}
         ]
 
         payload = {
@@ -187,23 +444,12 @@ class QwenAPIClient:
             # 只使用最重要的停止序列，避免某些API不支持多个停止序列
             payload["stop"] = stop_sequences[:2]  # 限制为前2个
 
-        logger.debug(f"Sending OpenAI-compatible API request: {json.dumps(payload, indent=2)[:500]}...")
-        
-        try:
-            response = requests.post(self.endpoint, headers=self.headers, json=payload, timeout=self.timeout)
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            if response.status_code == 422:
-                # 可能是stop参数不支持，重试不带stop参数
-                logger.warning("API rejected stop parameter, retrying without it...")
-                payload.pop("stop", None)
-                response = requests.post(self.endpoint, headers=self.headers, json=payload, timeout=self.timeout)
-                response.raise_for_status()
-            else:
-                raise
+        return payload
 
-        response_data = response.json()
-        logger.debug(f"Received OpenAI-compatible API response: {json.dumps(response_data, indent=2)[:500]}...")
+    def _parse_openai_response(self, response_data: Dict[str, Any], stop_pattern: Optional[Pattern[str]]) -> str:
+        """从OpenAI兼容API响应中提取生成内容"""
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Received OpenAI-compatible API response: {json.dumps(response_data, indent=2)[:500]}...")
 
         if "choices" in response_data and len(response_data["choices"]) > 0:
             choice = response_data["choices"][0]
@@ -211,10 +457,7 @@ class QwenAPIClient:
                 generated_content = choice["message"]["content"]
                 
                 # 如果API不支持stop参数，手动处理停止序列
-                if stop_sequences:
-                    for stop_seq in stop_sequences:
-                        if stop_seq in generated_content:
-                            generated_content = generated_content.split(stop_seq)[0]
+                generated_content = _truncate_at_stop(generated_content, stop_pattern)
                 
                 request_id = response_data.get("id", "N/A")
                 logger.info(f"OpenAI-compatible API call successful. Request ID: {request_id}")
@@ -225,6 +468,39 @@ class QwenAPIClient:
             error_msg = response_data.get("error", {}).get("message", "Unknown error")
             raise LLMError(f"OpenAI-compatible API error: {error_msg}")
 
+    def _call_openai_compatible_api(self, prompt: str, temperature: float, max_tokens: int, 
+                                  stop_sequences: List[str], stop_pattern: Optional[Pattern[str]] = None,
+                                  prompt_prefix: Optional[str] = None) -> str:
+        """调用OpenAI兼容的API（包括自部署API）"""
+        payload = self._build_openai_payload(prompt, temperature, max_tokens, stop_sequences, prompt_prefix)
+        if self.stream:
+            payload["stream"] = True
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Sending OpenAI-compatible API request: {json.dumps(payload, indent=2)[:500]}...")
+        
+        try:
+            return self._send_openai_payload(payload, stop_sequences, stop_pattern)
+        except _HTTP_STATUS_ERRORS as e:
+            if e.response is not None and e.response.status_code == 422:
+                # 可能是stop参数不支持，重试不带stop参数
+                logger.warning("API rejected stop parameter, retrying without it...")
+                payload.pop("stop", None)
+                return self._send_openai_payload(payload, stop_sequences, stop_pattern)
+            raise
+
+    def _send_openai_payload(self, payload: Dict[str, Any], stop_sequences: List[str],
+                             stop_pattern: Optional[Pattern[str]]) -> str:
+        """发送OpenAI兼容请求并解析结果，根据payload中的stream字段选择流式或一次性读取"""
+        if payload.get("stream"):
+            generated_content = self._stream_completion(payload, stop_sequences, stop_pattern, _openai_stream_delta)
+            logger.info("OpenAI-compatible API streaming call successful.")
+            return generated_content
+
+        response = self._post(payload)
+        response.raise_for_status()
+        return self._parse_openai_response(response.json(), stop_pattern)
+
     def test_connection(self) -> bool:
         """测试API连接是否正常"""
         try:
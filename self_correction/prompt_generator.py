@@ -1,8 +1,22 @@
 # self_correction/prompt_generator.py
 
 from enum import Enum
-from typing import Dict, Any, List, Optional
-from .prompt_templates import PromptStrategy, DEFAULT_PROMPT_TEMPLATES, DEFAULT_FEW_SHOT_EXAMPLES
+from typing import Dict, Any, List, Optional, Tuple
+from .prompt_templates import (
+    PromptStrategy, DEFAULT_PROMPT_TEMPLATES, DEFAULT_FEW_SHOT_EXAMPLES,
+    TemplatePieces, compile_template, render_template
+)
+
+# 每条样本都会变化的模板字段；在它们之前的内容对同一数据库是固定的
+_DYNAMIC_FIELDS = frozenset(("nlq", "initial_sql", "hint"))
+
+def _split_template(template: str) -> Tuple[TemplatePieces, TemplatePieces]:
+    """在第一个动态字段处把模板拆成静态前缀与动态后缀两组片段"""
+    pieces = compile_template(template)
+    for i, (literal, name, spec, conversion) in enumerate(pieces):
+        if name in _DYNAMIC_FIELDS:
+            return pieces[:i] + [(literal, None, None, None)], [("", name, spec, conversion)] + pieces[i + 1:]
+    return pieces, []
 
 class PromptGenerator:
     """
@@ -26,6 +40,18 @@ class PromptGenerator:
         if PromptStrategy.GUIDED.value not in self.prompt_templates:
             raise ValueError(f"Prompt template '{PromptStrategy.GUIDED.value}' is missing.")
 
+        # 两种策略的模板在初始化时预切分并绑定为属性，空模板回退到通用模板
+        generic_template = self.prompt_templates[PromptStrategy.GENERIC.value]
+        guided_template = self.prompt_templates[PromptStrategy.GUIDED.value]
+        if not guided_template:
+            print(f"[WARN] Using generic prompt template as '{PromptStrategy.GUIDED.value}' not found.")
+            guided_template = generic_template
+        self._parts_generic = _split_template(generic_template)
+        self._parts_guided = _split_template(guided_template)
+
+        # Few-shot部分在整个批次中不变，只格式化一次
+        self._few_shot_section = self._format_few_shot_examples()
+
     def generate_prompt(self, nlq: str, schema_context: str, initial_sql: str, 
                        strategy: PromptStrategy, hint: str) -> str:
         """
@@ -41,26 +67,26 @@ class PromptGenerator:
         Returns:
             str: 完整的Prompt文本。
         """
-        prompt_template_key = strategy.value
-        template = self.prompt_templates.get(prompt_template_key)
+        prefix, suffix = self.generate_prompt_parts(nlq, schema_context, initial_sql, strategy, hint)
+        return prefix + suffix
 
-        if not template:
-            # Fallback to generic template
-            template = self.prompt_templates[PromptStrategy.GENERIC.value]
-            print(f"[WARN] Using generic prompt template as '{prompt_template_key}' not found.")
-
-        # Add few-shot examples if available
-        few_shot_section = self._format_few_shot_examples() if self.few_shot_examples else ""
-
-        # Fill the template
-        full_prompt = template.format(
-            nlq=nlq,
-            schema_context=schema_context,
-            initial_sql=initial_sql,
-            hint=hint
-        )
+    def generate_prompt_parts(self, nlq: str, schema_context: str, initial_sql: str,
+                              strategy: PromptStrategy, hint: str) -> Tuple[str, str]:
+        """
+        生成与 generate_prompt 相同的Prompt，但拆分为 (静态前缀, 动态后缀) 两部分。
 
-        return few_shot_section + full_prompt
+        静态前缀包含few-shot示例、指令与Schema，对同一数据库的所有问题完全相同，
+        可交给支持前缀缓存的服务端缓存；两部分拼接即为完整Prompt。
+        """
+        static_pieces, dynamic_pieces = self._parts_guided if strategy is PromptStrategy.GUIDED else self._parts_generic
+        fields = {
+            "nlq": nlq,
+            "schema_context": schema_context,
+            "initial_sql": initial_sql,
+            "hint": hint
+        }
+        return (self._few_shot_section + render_template(static_pieces, fields),
+                render_template(dynamic_pieces, fields))
 
     def _format_few_shot_examples(self) -> str:
         """
@@ -69,7 +95,6 @@ class PromptGenerator:
         if not self.few_shot_examples:
             return ""
             
-        formatted_examples = ""
         example_template = """Problem: {question}
 Schema:
 {schema_text}
@@ -80,13 +105,15 @@ Correct SQL: {correct_sql}
 ---
 """
 
-        for example in self.few_shot_examples:
-            formatted_examples += example_template.format(
+        formatted_examples = [
+            example_template.format(
                 question=example.get("question", ""),
                 schema_text=example.get("schema_text", ""),
                 initial_sql=example.get("initial_sql", ""),
                 hint=example.get("hint", ""),
                 correct_sql=example.get("correct_sql", "")
             )
+            for example in self.few_shot_examples
+        ]
 
-        return formatted_examples + "\n"
\ No newline at end of file
+        return "".join(formatted_examples) + "\n"
\ No newline at end of file
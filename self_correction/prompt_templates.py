@@ -1,12 +1,35 @@
 # self_correction/prompt_templates.py
 
+import string
 from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
 
 class PromptStrategy(Enum):
     """定义Prompt构造策略"""
     GENERIC = "generic"  # 通用指令
     GUIDED = "guided"    # 基于反馈的指导性提示
 
+_FORMATTER = string.Formatter()
+
+# 预解析后的模板片段：(字面文本, 字段名, 格式说明, 转换符)
+TemplatePieces = List[Tuple[str, Optional[str], Optional[str], Optional[str]]]
+
+def compile_template(template: str) -> TemplatePieces:
+    """将 str.format 风格的模板预先拆分为片段，避免每次填充时重新解析模板"""
+    return list(_FORMATTER.parse(template))
+
+def render_template(pieces: TemplatePieces, fields: Dict[str, Any]) -> str:
+    """用字段值填充 compile_template 产生的片段，结果与 template.format(**fields) 一致"""
+    parts = []
+    for literal, name, spec, conversion in pieces:
+        parts.append(literal)
+        if name is not None:
+            value = fields[name]
+            if conversion:
+                value = _FORMATTER.convert_field(value, conversion)
+            parts.append(format(value, spec) if spec else str(value))
+    return "".join(parts)
+
 # 默认的Prompt模板
 DEFAULT_PROMPT_TEMPLATES = {
     "generic": """You are an expert SQL developer capable of identifying and correcting errors in SQL queries generated from natural language.
@@ -5,7 +5,12 @@ import logging
 import json
 import time
 import random
-from typing import Dict, Any, Tuple, Optional
+import queue
+import collections
+import threading
+import weakref
+import concurrent.futures
+from typing import Dict, Any, List, Tuple, Optional
 from .prompt_generator import PromptGenerator, PromptStrategy
 from .llm_api import QwenAPIClient, LLMError
 from .sql_validator import SQLValidator, ExecutionResult
@@ -14,6 +19,59 @@ from .config import SelfCorrectionConfig
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# orjson 直接输出UTF-8 bytes，序列化日志明显快于标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _dumps_log(log_data: Dict[str, Any]) -> bytes:
+    """将一条修正日志序列化为JSON bytes（非ASCII字符原样保留）"""
+    if orjson is not None:
+        return orjson.dumps(log_data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(log_data, ensure_ascii=False).encode("utf-8")
+
+# 常见错误模式合并为一个正则，一次扫描SQL即可找出所有命中。
+# FROM ... WHERE 模式放在前瞻中，不吞掉其中可能出现的表名/列名。
+def _stop_log_writer(log_queue: "queue.Queue", writer: threading.Thread, log_fh) -> None:
+    """发送结束标记、等待写日志线程写完队列中的剩余日志，然后关闭文件（会刷盘）"""
+    if writer.is_alive():
+        log_queue.put(None)
+        writer.join()
+    if not log_fh.closed:
+        log_fh.close()
+
+_ERROR_PATTERN_RE = re.compile(
+    r'(?P<students>\bstudents\b)'
+    r'|(?P<singers>\bsingers\b)'
+    r'|(?P<name>\bName\b)'
+    r'|(?P<population>\bPopulation\b)'
+    r'|(?P<age>\bAge\b)'
+    r'|(?=(?P<fromref>FROM\s+\w+\s+WHERE\s+\w+\.\w+))',
+    re.IGNORECASE
+)
+# 命名分组 -> (优先级, 错误类型)；多个模式同时命中时报告优先级最高的类型
+_ERROR_PATTERN_GROUPS = {
+    'students': (0, 'table_name_plural'),
+    'singers': (0, 'table_name_plural'),
+    'name': (1, 'column_name_case'),
+    'population': (1, 'column_name_case'),
+    'age': (1, 'column_name_case'),
+    'fromref': (2, 'possible_redundant_reference'),
+}
+
+# LLM响应中的SQL标记，按优先级排列；一次扫描即可定位各标记的首次出现位置
+_SQL_MARKERS = ("Fixed SQL:", "Corrected SQL:", "Correct SQL:", "SQL:", "Fixed:")
+_SQL_MARKER_RE = re.compile("|".join(re.escape(marker) for marker in _SQL_MARKERS))
+
+# SQL起始关键字（按优先级）与常见子句关键字，一次不区分大小写的扫描同时定位两类关键字。
+# 这些关键字之间互不重叠，finditer 不会漏掉任何一个的首次出现。
+_SQL_START_KEYWORDS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+_SQL_CLAUSE_KEYWORDS = ("FROM", "WHERE", "JOIN")
+_SQL_KEYWORD_RE = re.compile("|".join(_SQL_START_KEYWORDS + _SQL_CLAUSE_KEYWORDS), re.IGNORECASE)
+# 候选SQL行须包含的语句关键字（子串匹配，不区分大小写）
+_SQL_VERB_RE = re.compile("SELECT|INSERT|UPDATE|DELETE", re.IGNORECASE)
+
 class SelfCorrectionModule:
     """
     核心自修正模块，集成 Prompt Generation, LLM Interaction, SQL Validation,
@@ -30,6 +88,7 @@ class SelfCorrectionModule:
         self.config = config
         
         # 验证配置
+        config.ensure_ready()
         if not config.validate_config():
             raise ValueError("Invalid configuration provided")
             
@@ -39,13 +98,38 @@ class SelfCorrectionModule:
             endpoint=config.llm_api_endpoint,
             model=config.llm_model_name,
             timeout=config.llm_timeout_seconds,
-            max_retries=config.llm_max_retries
+            max_retries=config.llm_max_retries,
+            stream=config.llm_stream,
+            cache_control=config.llm_prompt_cache_control,
+            max_concurrency=max(1, getattr(config, 'max_workers', 16))
         )
         self.sql_validator = SQLValidator(timeout_seconds=30)
         self.log_dir = config.log_dir
+        # 同一数据库的问题共享Schema，格式化结果按 db_id 缓存
+        self._schema_text_cache: Dict[str, str] = {}
+        # db_path -> db_id，批量处理同一数据库时不必重复拆分路径
+        self._db_id_cache: Dict[str, str] = {}
 
         # Ensure log directory exists
         os.makedirs(self.log_dir, exist_ok=True)
+        # 所有修正日志追加到同一个 JSONL 文件，每次修正一行
+        self.log_file_path = os.path.join(self.log_dir, "corrections.jsonl")
+        # 日志计数只在初始化时统计一次已有记录，之后由写日志线程递增
+        self._log_count = 0
+        if os.path.exists(self.log_file_path):
+            with open(self.log_file_path, 'rb') as f:
+                self._log_count = sum(1 for _ in f)
+        self._log_count_lock = threading.Lock()
+        self._log_fh = open(self.log_file_path, 'ab')
+        # 日志由后台线程写盘，process() 不再等待文件 I/O；只有该线程写 _log_fh
+        self._log_queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._log_writer = threading.Thread(target=self._log_writer_loop, name="correction-log-writer", daemon=True)
+        self._log_writer.start()
+        # 调用方未调用 close() 时，在解释器退出前（atexit）写完并刷盘剩余日志；
+        # 回调不引用 self，close() 中显式调用时只执行一次
+        self._log_finalizer = weakref.finalize(
+            self, _stop_log_writer, self._log_queue, self._log_writer, self._log_fh
+        )
         logger.info(f"SelfCorrectionModule initialized with log directory: {self.log_dir}")
         
         # Test API connection
@@ -64,7 +148,75 @@ class SelfCorrectionModule:
         """
         智能处理：使用更智能的策略判断是否需要修正
         """
-        db_id = os.path.basename(os.path.dirname(db_path)) if os.path.dirname(db_path) else "unknown"
+        ctx = self._prepare_correction(nlq, schema, initial_sql, db_path)
+        if ctx["prompt"] is not None:
+            db_id = ctx["log"]["db_id"]
+            # 4. 调用 LLM API
+            try:
+                logger.info(f"Calling LLM for DB {db_id}...")
+                llm_response_raw = self.llm_client.get_correction(
+                    prompt=ctx["prompt"],
+                    temperature=self.config.llm_temperature,
+                    max_tokens=self.config.llm_max_tokens,
+                    stop_sequences=self.config.llm_stop_sequences,
+                    stop_pattern=self.config.llm_stop_re,
+                    prompt_prefix=ctx["prompt_prefix"]
+                )
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("LLM response for DB %s: %s...", db_id, llm_response_raw[:500])
+            except LLMError as e:
+                self._record_api_error(ctx, e)
+            except Exception as e:
+                self._record_internal_error(ctx, e)
+            else:
+                self._complete_correction(ctx, llm_response_raw)
+        return self._finalize_correction(ctx)
+
+    def process_batch(self, items: List[Tuple[str, Dict[str, Any], str, str]]) -> List[Tuple[str, str]]:
+        """
+        批量处理：逐条验证并生成Prompt，需要修正的Prompt合并为一批提交给LLM，
+        再逐条解析、验证并应用回退策略。
+
+        Args:
+            items: (nlq, schema, initial_sql, db_path) 列表。
+
+        Returns:
+            List[Tuple[str, str]]: 与 items 一一对应的 (最终SQL, 修正状态)。
+        """
+        contexts = [self._prepare_correction(*item) for item in items]
+        pending = [ctx for ctx in contexts if ctx["prompt"] is not None]
+        if pending:
+            logger.info(f"Calling LLM for {len(pending)} prompts in one batch...")
+            try:
+                responses = self.llm_client.get_corrections(
+                    [ctx["prompt"] for ctx in pending],
+                    temperature=self.config.llm_temperature,
+                    max_tokens=self.config.llm_max_tokens,
+                    stop_sequences=self.config.llm_stop_sequences,
+                    stop_pattern=self.config.llm_stop_re,
+                    prompt_prefixes=[ctx["prompt_prefix"] for ctx in pending],
+                    return_exceptions=True
+                )
+            except LLMError as e:
+                responses = [e] * len(pending)
+            for ctx, response in zip(pending, responses):
+                if isinstance(response, LLMError):
+                    self._record_api_error(ctx, response)
+                elif isinstance(response, BaseException):
+                    self._record_internal_error(ctx, response)
+                else:
+                    self._complete_correction(ctx, response)
+        return [self._finalize_correction(ctx) for ctx in contexts]
+
+    def _prepare_correction(self, nlq: str, schema: Dict[str, Any], initial_sql: str, db_path: str) -> Dict[str, Any]:
+        """
+        修正流程的前半部分：验证初始SQL、判断是否需要修正并生成Prompt。
+        返回的上下文中 prompt 为 None 表示无需调用LLM（无需修正或内部错误）。
+        """
+        db_id = self._db_id_cache.get(db_path)
+        if db_id is None:
+            db_dir = os.path.dirname(db_path)
+            db_id = self._db_id_cache.setdefault(db_path, os.path.basename(db_dir) if db_dir else "unknown")
 
         correction_log = {
             "question": nlq,
@@ -81,12 +233,20 @@ class SelfCorrectionModule:
             "processing_time_ms": 0,
             "correction_reason": None
         }
-        start_time = time.time()
+        ctx = {
+            "log": correction_log,
+            "start_time": time.time(),
+            "db_path": db_path,
+            "initial_validation_result": None,
+            "prompt": None,
+            "prompt_prefix": None
+        }
 
         try:
             # 1. 首先验证初始SQL
             initial_validation_result = self._validate_sql(initial_sql, db_path)
             correction_log["initial_sql_executable"] = initial_validation_result.is_executable
+            ctx["initial_validation_result"] = initial_validation_result
             
             # 🎯 修改策略：智能判断是否需要修正
             should_attempt_correction, reason = self._should_attempt_correction(
@@ -98,9 +258,7 @@ class SelfCorrectionModule:
                 logger.info(f"Skipping correction for DB {db_id} - {reason}")
                 correction_log["correction_status"] = "no_correction_needed"
                 correction_log["final_sql_output"] = initial_sql
-                self._save_log(correction_log)
-                correction_log["processing_time_ms"] = (time.time() - start_time) * 1000
-                return initial_sql, "no_correction_needed"
+                return ctx
             
             # 2. 需要修正时，生成适当的Prompt
             logger.info(f"Attempting correction for DB {db_id} - {reason}")
@@ -113,44 +271,41 @@ class SelfCorrectionModule:
                 prompt_strategy = PromptStrategy.GUIDED
 
             # 3. 生成保守的Prompt
-            schema_text = self._format_schema_for_prompt(schema)
-            prompt = self.prompt_generator.generate_prompt(
+            schema_text = self._get_schema_text(db_id, schema)
+            prompt_prefix, prompt_suffix = self.prompt_generator.generate_prompt_parts(
                 nlq=nlq,
                 schema_context=schema_text,
                 initial_sql=initial_sql,
                 strategy=prompt_strategy,
                 hint=hint
             )
+            prompt = prompt_prefix + prompt_suffix
             correction_log["prompt_used"] = prompt
-            logger.debug(f"Generated prompt for DB {db_id}: {prompt[:500]}...")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Generated prompt for DB %s: %s...", db_id, prompt[:500])
+            ctx["prompt"] = prompt
+            ctx["prompt_prefix"] = prompt_prefix
 
-            # 4. 调用 LLM API
-            try:
-                logger.info(f"Calling LLM for DB {db_id}...")
-                llm_response_raw = self.llm_client.get_correction(
-                    prompt=prompt,
-                    temperature=self.config.llm_temperature,
-                    max_tokens=self.config.llm_max_tokens,
-                    stop_sequences=self.config.llm_stop_sequences
-                )
-                logger.debug(f"LLM response for DB {db_id}: {llm_response_raw[:500]}...")
-            except LLMError as e:
-                logger.error(f"LLM API call failed for DB {db_id}: {e}")
-                correction_log["validation_error"] = f"LLM API Error: {e}"
-                correction_log["correction_status"] = "api_error"
-                self._save_log(correction_log)
-                correction_log["processing_time_ms"] = (time.time() - start_time) * 1000
-                return initial_sql, correction_log["correction_status"]
+        except Exception as e:
+            self._record_internal_error(ctx, e)
+
+        return ctx
 
+    def _complete_correction(self, ctx: Dict[str, Any], llm_response_raw: str):
+        """修正流程的后半部分：解析LLM响应、验证修正后的SQL并应用回退策略"""
+        correction_log = ctx["log"]
+        db_id = correction_log["db_id"]
+        initial_sql = correction_log["initial_sql"]
+        try:
             # 5. 解析 LLM 响应
             corrected_sql = self._parse_llm_response(llm_response_raw)
             correction_log["corrected_sql_llm"] = corrected_sql
-            logger.debug(f"Parsed corrected SQL for DB {db_id}: {corrected_sql}")
+            logger.debug("Parsed corrected SQL for DB %s: %s", db_id, corrected_sql)
 
             corrected_validation_result = ExecutionResult(False, "No corrected SQL to validate")
             if corrected_sql:
                 # 6. 验证修正后的 SQL
-                corrected_validation_result = self._validate_sql(corrected_sql, db_path)
+                corrected_validation_result = self._validate_sql(corrected_sql, ctx["db_path"])
                 correction_log["corrected_sql_executable"] = corrected_validation_result.is_executable
                 if not corrected_validation_result.is_executable:
                     correction_log["validation_error"] = corrected_validation_result.error_message
@@ -162,7 +317,7 @@ class SelfCorrectionModule:
             # 7. 应用智能回退策略
             final_sql, correction_status = self._apply_intelligent_fallback_strategy(
                 initial_sql,
-                initial_validation_result,
+                ctx["initial_validation_result"],
                 corrected_sql if corrected_sql else initial_sql,
                 corrected_validation_result
             )
@@ -171,16 +326,29 @@ class SelfCorrectionModule:
             logger.info(f"Final SQL decision for DB {db_id}: {correction_status}")
 
         except Exception as e:
-            logger.error(f"Unexpected error during correction for DB {db_id}: {e}", exc_info=True)
-            correction_log["validation_error"] = f"Unexpected internal error: {e}"
-            correction_log["correction_status"] = "internal_error"
-            final_sql = initial_sql
-            correction_status = "internal_error"
+            self._record_internal_error(ctx, e)
 
-        finally:
-            correction_log["processing_time_ms"] = (time.time() - start_time) * 1000
-            self._save_log(correction_log)
-            return correction_log["final_sql_output"], correction_log["correction_status"]
+    def _record_api_error(self, ctx: Dict[str, Any], error: LLMError):
+        """记录LLM调用失败，最终输出保持初始SQL"""
+        correction_log = ctx["log"]
+        logger.error(f"LLM API call failed for DB {correction_log['db_id']}: {error}")
+        correction_log["validation_error"] = f"LLM API Error: {error}"
+        correction_log["correction_status"] = "api_error"
+
+    def _record_internal_error(self, ctx: Dict[str, Any], error: BaseException):
+        """记录意外的内部错误，最终输出回退为初始SQL"""
+        correction_log = ctx["log"]
+        logger.error(f"Unexpected error during correction for DB {correction_log['db_id']}: {error}", exc_info=error)
+        correction_log["validation_error"] = f"Unexpected internal error: {error}"
+        correction_log["correction_status"] = "internal_error"
+        correction_log["final_sql_output"] = correction_log["initial_sql"]
+
+    def _finalize_correction(self, ctx: Dict[str, Any]) -> Tuple[str, str]:
+        """记录耗时并保存日志，返回 (最终SQL, 修正状态)"""
+        correction_log = ctx["log"]
+        correction_log["processing_time_ms"] = (time.time() - ctx["start_time"]) * 1000
+        self._save_log(correction_log)
+        return correction_log["final_sql_output"], correction_log["correction_status"]
 
     def _should_attempt_correction(self, sql: str, validation_result: ExecutionResult, nlq: str) -> Tuple[bool, str]:
         """智能判断是否应该尝试修正SQL"""
@@ -193,58 +361,57 @@ class SelfCorrectionModule:
         if hasattr(validation_result, 'result_count') and validation_result.result_count == 0:
             return True, "SQL可执行但返回空结果"
         
-        # 3. 检查常见错误模式
-        error_patterns = [
-            (r'\bstudents\b', 'table_name_plural'),
-            (r'\bsingers\b', 'table_name_plural'), 
-            (r'\bName\b', 'column_name_case'),
-            (r'\bPopulation\b', 'column_name_case'),
-            (r'\bAge\b', 'column_name_case'),
-            (r'FROM\s+\w+\s+WHERE\s+\w+\.\w+', 'possible_redundant_reference'),
-        ]
-        
-        for pattern, error_type in error_patterns:
-            if re.search(pattern, sql, re.IGNORECASE):
-                return True, f"发现可能错误模式: {error_type}"
-        
-        # 4. 基于问题类型的启发式判断
+        # 3. 基于问题类型的启发式判断（纯子串检查，开销最小，先于正则扫描）
         nlq_lower = nlq.lower()
+        sql_lower = sql.lower()
         
-        if 'how many' in nlq_lower and 'count(' not in sql.lower():
+        if 'how many' in nlq_lower and 'count(' not in sql_lower:
             return True, "问题询问数量但SQL中无count函数"
         
-        if 'average' in nlq_lower and 'avg(' not in sql.lower():
+        if 'average' in nlq_lower and 'avg(' not in sql_lower:
             return True, "问题询问平均值但SQL中无avg函数"
             
-        if 'maximum' in nlq_lower and 'max(' not in sql.lower():
+        if 'maximum' in nlq_lower and 'max(' not in sql_lower:
             return True, "问题询问最大值但SQL中无max函数"
             
-        if 'minimum' in nlq_lower and 'min(' not in sql.lower():
+        if 'minimum' in nlq_lower and 'min(' not in sql_lower:
             return True, "问题询问最小值但SQL中无min函数"
         
+        # 4. 检查常见错误模式
+        best = None
+        for m in _ERROR_PATTERN_RE.finditer(sql):
+            rank, error_type = _ERROR_PATTERN_GROUPS[m.lastgroup]
+            if best is None or rank < best[0]:
+                best = (rank, error_type)
+                if rank == 0:
+                    break
+        if best is not None:
+            return True, f"发现可能错误模式: {best[1]}"
+        
         # 5. 检查SQL复杂度和潜在改进点
-        if self._has_potential_improvements(sql, nlq):
+        if self._has_potential_improvements(sql, sql.upper(), nlq_lower):
             return True, "发现潜在改进点"
         
-        # 6. 随机采样修正（用于探索和测试）
-        if random.random() < 0.02:  # 10%的概率尝试修正
+        # 6. 随机采样修正（用于探索和测试，默认关闭）
+        exploration_rate = self.config.exploration_rate
+        if exploration_rate and random.random() < exploration_rate:
             return True, "随机选择进行修正（探索模式）"
         
         return False, "SQL判定为无需修正"
 
-    def _has_potential_improvements(self, sql: str, nlq: str) -> bool:
-        """检查SQL是否有潜在改进点"""
+    def _has_potential_improvements(self, sql: str, sql_upper: str, nlq_lower: str) -> bool:
+        """检查SQL是否有潜在改进点（sql_upper / nlq_lower 由调用方预先计算一次）"""
         
         # 检查是否有不必要的复杂性
         if sql.count('SELECT') > 1 and len(sql) < 100:
             return True  # 短SQL中有多个SELECT可能可以简化
         
         # 检查是否缺少常见的优化
-        if 'JOIN' in sql.upper() and 'ON' not in sql.upper():
+        if 'JOIN' in sql_upper and 'ON' not in sql_upper:
             return True  # JOIN但没有ON条件
         
         # 检查列名和表名的一致性
-        if 'SELECT *' in sql.upper() and any(word in nlq.lower() for word in ['name', 'id', 'count']):
+        if 'SELECT *' in sql_upper and any(word in nlq_lower for word in ['name', 'id', 'count']):
             return True  # 问题可能需要特定列而不是所有列
         
         return False
@@ -324,6 +491,15 @@ class SelfCorrectionModule:
         else:
             return "Fix any execution errors, but make minimal changes to the SQL structure."
 
+    def _get_schema_text(self, db_id: str, schema: Dict[str, Any]) -> str:
+        """返回格式化后的Schema文本；db_id 未知时不缓存，避免不同数据库互相覆盖"""
+        if db_id == "unknown":
+            return self._format_schema_for_prompt(schema)
+        schema_text = self._schema_text_cache.get(db_id)
+        if schema_text is None:
+            schema_text = self._schema_text_cache[db_id] = self._format_schema_for_prompt(schema)
+        return schema_text
+
     def _format_schema_for_prompt(self, schema: Dict[str, Any]) -> str:
         """将结构化的Schema信息转换为详细的文本格式"""
         if not schema:
@@ -339,36 +515,35 @@ class SelfCorrectionModule:
             return "Schema incomplete"
 
         # 构建详细的表结构描述
-        schema_text = "Database Schema:\n"
+        parts = ["Database Schema:\n"]
         
         # 按表分组列信息
-        table_columns = {}
+        table_columns = collections.defaultdict(list)
+        # 复合主键以列表形式出现时不可哈希，且原先的列表成员判断也不会命中，直接跳过
+        pk_set = frozenset(pk for pk in primary_keys if isinstance(pk, int))
+        num_tables = len(tables)
+        num_types = len(column_types)
         for i, (table_id, column_name) in enumerate(columns):
             if table_id == -1:  # 跳过*占位符
                 continue
-            if table_id < len(tables):
-                table_name = tables[table_id]
-                if table_name not in table_columns:
-                    table_columns[table_name] = []
-                
+            if table_id < num_tables:
                 col_info = column_name
-                if i < len(column_types):
+                if i < num_types:
                     col_info += f" {column_types[i].upper()}"
-                if i in primary_keys:
+                if i in pk_set:
                     col_info += " PRIMARY KEY"
                     
-                table_columns[table_name].append(col_info)
+                table_columns[tables[table_id]].append(col_info)
         
         # 生成表定义
         for table_name, cols in table_columns.items():
-            schema_text += f"\nTABLE {table_name} (\n"
-            for col in cols:
-                schema_text += f"  {col},\n"
-            schema_text = schema_text.rstrip(',\n') + "\n);\n"
+            parts.append(f"\nTABLE {table_name} (\n")
+            parts.append(",\n".join(f"  {col}" for col in cols))
+            parts.append("\n);\n")
         
         # 添加外键关系
         if foreign_keys:
-            schema_text += "\nForeign Keys:\n"
+            parts.append("\nForeign Keys:\n")
             for fk in foreign_keys:
                 if len(fk) == 2 and fk[0] < len(columns) and fk[1] < len(columns):
                     try:
@@ -376,11 +551,11 @@ class SelfCorrectionModule:
                         from_col = columns[fk[0]][1]
                         to_table = tables[columns[fk[1]][0]]
                         to_col = columns[fk[1]][1]
-                        schema_text += f"- {from_table}.{from_col} references {to_table}.{to_col}\n"
+                        parts.append(f"- {from_table}.{from_col} references {to_table}.{to_col}\n")
                     except IndexError:
                         continue  # 跳过有问题的外键定义
         
-        return schema_text.strip()
+        return "".join(parts).strip()
 
     def _parse_llm_response(self, response_text: str) -> Optional[str]:
         """增强的LLM响应解析器"""
@@ -391,34 +566,38 @@ class SelfCorrectionModule:
         cleaned_text = response_text.strip()
         
         # 方法1: 查找明确的标记
-        markers = [
-            "Fixed SQL:",
-            "Corrected SQL:",
-            "Correct SQL:",
-            "SQL:",
-            "Fixed:"
-        ]
-        
-        for marker in markers:
-            if marker in cleaned_text:
-                sql_part = cleaned_text.split(marker, 1)[1].strip()
+        # 记录每个标记首次出现后的位置；"SQL:" 也可能出现在 "Fixed SQL:" 等标记内部
+        marker_ends: Dict[str, int] = {}
+        for m in _SQL_MARKER_RE.finditer(cleaned_text):
+            marker = m.group()
+            marker_ends.setdefault(marker, m.end())
+            if marker.endswith(" SQL:"):
+                marker_ends.setdefault("SQL:", m.end())
+        
+        for marker in _SQL_MARKERS:
+            if marker in marker_ends:
+                sql_part = cleaned_text[marker_ends[marker]:].strip()
                 sql_candidate = self._extract_sql_from_text(sql_part)
                 if sql_candidate:
                     return sql_candidate
         
+        # 一次扫描记录各关键字首次出现的位置，供方法2和方法3共用
+        keyword_starts: Dict[str, int] = {}
+        for m in _SQL_KEYWORD_RE.finditer(cleaned_text):
+            keyword_starts.setdefault(m.group().upper(), m.start())
+        
         # 方法2: 查找SQL关键字
-        sql_keywords = ["SELECT", "INSERT", "UPDATE", "DELETE", "WITH"]
-        for keyword in sql_keywords:
-            if keyword in cleaned_text.upper():
-                # 找到关键字的位置
-                start_idx = cleaned_text.upper().find(keyword)
+        for keyword in _SQL_START_KEYWORDS:
+            # 找到关键字的位置
+            start_idx = keyword_starts.get(keyword)
+            if start_idx is not None:
                 sql_part = cleaned_text[start_idx:]
                 sql_candidate = self._extract_sql_from_text(sql_part)
                 if sql_candidate:
                     return sql_candidate
         
         # 方法3: 如果包含常见SQL模式，尝试整体解析
-        if any(pattern in cleaned_text.upper() for pattern in ["FROM", "WHERE", "JOIN"]):
+        if any(keyword in keyword_starts for keyword in _SQL_CLAUSE_KEYWORDS):
             sql_candidate = self._extract_sql_from_text(cleaned_text)
             if sql_candidate:
                 return sql_candidate
@@ -448,10 +627,10 @@ class SelfCorrectionModule:
         lines = text.split('\n')
         for line in lines:
             line = line.strip()
-            if line and not line.startswith('#') and not line.startswith('--') and not line.startswith('Note:'):
+            if line and not line.startswith(('#', '--', 'Note:')):
                 # 移除末尾分号
                 sql_candidate = line.rstrip(';').strip()
-                if len(sql_candidate) > 10 and any(keyword in sql_candidate.upper() for keyword in ["SELECT", "INSERT", "UPDATE", "DELETE"]):
+                if len(sql_candidate) > 10 and _SQL_VERB_RE.search(sql_candidate):
                     return sql_candidate
         
         return None
@@ -467,27 +646,43 @@ class SelfCorrectionModule:
             return ExecutionResult(False, f"Validator error: {e}")
 
     def _save_log(self, log_data: Dict[str, Any]):
-        """保存日志"""
-        timestamp = int(time.time())
-        log_file_path = os.path.join(
-            self.log_dir, 
-            f"correction_log_{log_data['db_id']}_{timestamp}.json"
-        )
-        try:
-            with open(log_file_path, 'w', encoding='utf-8') as f:
-                json.dump(log_data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"Failed to save log: {e}")
+        """保存日志（放入队列，由后台线程写盘）"""
+        self._log_queue.put(log_data)
+
+    def _log_writer_loop(self):
+        """后台写日志线程，收到 None 时退出"""
+        while True:
+            item = self._log_queue.get()
+            try:
+                if item is None:
+                    return
+                try:
+                    self._log_fh.write(_dumps_log(item) + b'\n')
+                    # 队列暂时为空时再刷盘，批量处理时合并写入
+                    if self._log_queue.empty():
+                        self._log_fh.flush()
+                    with self._log_count_lock:
+                        self._log_count += 1
+                except Exception as e:
+                    logger.error(f"Failed to save log: {e}")
+            finally:
+                self._log_queue.task_done()
+
+    def close(self):
+        """写完队列中剩余的日志、停止后台写日志线程，并关闭数据库连接池与LLM客户端的HTTP连接"""
+        self._log_finalizer()
+        self.sql_validator.close()
+        self.llm_client.close()
 
     def get_statistics(self) -> Dict[str, Any]:
         """获取修正模块的统计信息"""
-        log_files = []
-        if os.path.exists(self.log_dir):
-            log_files = [f for f in os.listdir(self.log_dir) if f.endswith('.json')]
-        
+        # 等待已排队的日志写完，保证计数准确
+        if self._log_writer.is_alive():
+            self._log_queue.join()
         stats = {
-            "total_corrections_attempted": len(log_files),
+            "total_corrections_attempted": self._log_count,
             "log_directory": self.log_dir,
+            "log_file": self.log_file_path,
             "config_summary": {
                 "model": self.config.llm_model_name,
                 "temperature": self.config.llm_temperature,
@@ -520,10 +715,24 @@ def self_correction_main(predict_sqls, db_ids, questions, config_path, output_pa
     schema_dict = getattr(config, 'schema_dict', {})
     db_path_dict = getattr(config, 'db_path_dict', {})
     default_db_path = getattr(config, 'db_path', None)
-    for sql, db_id, question in zip(predict_sqls, db_ids, questions):
-        schema = schema_dict.get(db_id, {})
-        db_path = db_path_dict.get(db_id, default_db_path)
-        corrected_sql, status = module.process(question, schema, sql, db_path)
+    work_items = [
+        (question, schema_dict.get(db_id, {}), sql, db_path_dict.get(db_id, default_db_path))
+        for sql, db_id, question in zip(predict_sqls, db_ids, questions)
+    ]
+    # LLM调用以网络等待为主，多线程并发处理；ex.map 保持输入顺序
+    max_workers = max(1, getattr(config, 'max_workers', 16))
+    batch_size = max(1, getattr(config, 'llm_batch_size', 1))
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as ex:
+            if batch_size > 1:
+                # 每批的Prompt合并提交，摊薄单次请求的网络开销
+                batches = [work_items[i:i + batch_size] for i in range(0, len(work_items), batch_size)]
+                results = [result for batch in ex.map(module.process_batch, batches) for result in batch]
+            else:
+                results = list(ex.map(lambda args: module.process(*args), work_items))
+    finally:
+        module.close()
+    for (sql, db_id, question), (corrected_sql, status) in zip(zip(predict_sqls, db_ids, questions), results):
         corrected_sqls.append(corrected_sql)
         detailed_logs.append({
             "question": question,
@@ -1,13 +1,74 @@
 # self_correction/sql_validator.py
 
+import re
 import sqlite3
 import logging
 import time
 import os
-from typing import Tuple, Optional
+import stat
+import collections
+import concurrent.futures
+import queue
+import threading
+from typing import Any, Dict, Iterator, List, Tuple, Optional
 
 logger = logging.getLogger(__name__)
 
+# 只读查询的前缀；只有这类查询的验证结果会被缓存
+_READ_PREFIXES = ("SELECT", "WITH")
+
+# _clean_sql 使用的预编译正则：markdown 代码块标记、末尾分号、连续空白
+_FENCE_RE = re.compile(r"^\s*```(?:sql)?\s*|\s*```\s*$", re.IGNORECASE)
+_TRAIL_SEMI_RE = re.compile(r";\s*$")
+_WS_RE = re.compile(r"\s+")
+
+# 一次扫描完成 OperationalError 分类，命中的命名分组即类别；均未命中归为 operational
+_OPERATIONAL_ERROR_RE = re.compile(
+    r"(?P<timeout>timeout|database is locked)"
+    r"|(?P<syntax>syntax error|near)"
+    r"|(?P<schema>no such table|no such column)",
+    re.IGNORECASE,
+)
+
+# OperationalError 类别 -> (返回给调用方的消息前缀, 调试日志中的描述)
+_OPERATIONAL_ERRORS = {
+    "timeout": ("Execution timeout or database locked", "timeout/lock"),
+    "syntax": ("Syntax error", "syntax error"),
+    "schema": ("Schema error", "schema error"),
+    "operational": ("Operational error", "operational error"),
+}
+
+# 每个池化连接创建时执行一次的只读验证 PRAGMA，合并为一个脚本一次下发
+_INIT_PRAGMAS = """
+PRAGMA query_only = 1;
+PRAGMA synchronous = NORMAL;
+PRAGMA temp_store = MEMORY;
+PRAGMA mmap_size = 1073741824;
+PRAGMA cache_size = -131072;
+"""
+
+# db_path -> (检查时刻, (mtime, 文件大小) 或 None)；TTL 内复用，省去每次调用的 stat
+_PATH_CACHE: Dict[str, Tuple[float, Optional[Tuple[float, int]]]] = {}
+_PATH_CACHE_TTL = 1.0
+
+
+def _stat_db(db_path: str) -> Optional[Tuple[float, int]]:
+    """返回数据库文件的 (mtime, 大小)；不存在或不是普通文件时返回 None"""
+    now = time.monotonic()
+    cached = _PATH_CACHE.get(db_path)
+    if cached is not None and now - cached[0] < _PATH_CACHE_TTL:
+        return cached[1]
+    try:
+        st = os.stat(db_path)
+        info = (st.st_mtime, st.st_size) if stat.S_ISREG(st.st_mode) else None
+    except OSError:
+        info = None
+    _PATH_CACHE[db_path] = (now, info)
+    return info
+
+# db_path -> (PRAGMA schema_version, 文件大小, 数据库信息)；两者都未变化时直接复用
+_DBINFO_CACHE: Dict[str, Tuple[int, int, Dict[str, Any]]] = {}
+
 class ExecutionResult:
     """Holds the result of SQL execution validation."""
     def __init__(self, is_executable: bool, error_message: Optional[str] = None, 
@@ -20,18 +81,39 @@ class ExecutionResult:
     def __repr__(self):
         return f"ExecutionResult(executable={self.is_executable}, error='{self.error_message}', count={self.result_count})"
 
+    def copy(self) -> "ExecutionResult":
+        """返回独立副本，避免调用方修改缓存中的共享对象"""
+        return ExecutionResult(self.is_executable, self.error_message, self.result_count, self.execution_time)
+
 class SQLValidator:
     """
     用于在指定的SQLite数据库文件上验证SQL查询是否可执行。
     """
-    def __init__(self, timeout_seconds: int = 30):
+    # 计数上限：自我修正只关心结果是否为空，超过该行数后不再继续扫描
+    MAX_COUNT = 10000
+
+    def __init__(self, timeout_seconds: int = 30, cache_size: int = 1024,
+                 pool_size: int = 8, max_pooled_dbs: int = 32):
         """
         初始化SQL Validator。
         
         Args:
             timeout_seconds (int): SQL执行超时时间（秒）
+            cache_size (int): 验证结果LRU缓存的最大条目数，0 表示不缓存
+            pool_size (int): 每个数据库保留的最大空闲连接数
+            max_pooled_dbs (int): 保留连接池的数据库数量上限，超出时淘汰最久未使用的
         """
         self.timeout_seconds = timeout_seconds
+        self.cache_size = cache_size
+        self.pool_size = pool_size
+        self.max_pooled_dbs = max_pooled_dbs
+        # db_path -> 空闲连接队列；连接复用，避免每次验证都重新打开数据库并设置PRAGMA
+        self._pools: "collections.OrderedDict[str, queue.Queue]" = collections.OrderedDict()
+        self._pools_lock = threading.Lock()
+        # (db_path, 数据库文件mtime, 清理后的SQL, fetch_results) -> ExecutionResult
+        # 数据库文件被修改后 mtime 变化，旧条目不再命中
+        self._cache: "collections.OrderedDict[Tuple[str, float, str, bool], ExecutionResult]" = collections.OrderedDict()
+        self._cache_lock = threading.Lock()
         logger.info(f"SQLValidator initialized with timeout: {timeout_seconds}s")
 
     def execute_sql(self, sql: str, db_path: str, fetch_results: bool = True) -> ExecutionResult:
@@ -46,131 +128,334 @@ class SQLValidator:
         Returns:
             ExecutionResult: 包含执行成功标志和错误信息的对象。
         """
+        return self._validate(sql, db_path, fetch_results)
+
+    def _validate(self, sql: str, db_path: str, fetch_results: bool,
+                  conn: Optional[sqlite3.Connection] = None) -> ExecutionResult:
+        """execute_sql 的实现；传入 conn 时（批量验证）在该连接上以 SAVEPOINT 隔离执行"""
         if not sql or not sql.strip():
             return ExecutionResult(False, "SQL query is empty")
         
-        if not db_path or not os.path.exists(db_path):
+        db_stat = _stat_db(db_path) if db_path else None
+        if db_stat is None:
             return ExecutionResult(False, f"Database file not found: {db_path}")
+        db_mtime = db_stat[0]
 
-        conn = None
+        # Clean and validate SQL
+        cleaned_sql = self._clean_sql(sql)
+        if not cleaned_sql:
+            return ExecutionResult(False, "SQL query is empty after cleaning")
+
+        # 未闭合的字符串/注释等不完整语句无需连接数据库、也不必等 SQLite 抛异常；
+        # 以换行收尾，避免末尾的 -- 注释吞掉分号
+        if not sqlite3.complete_statement(cleaned_sql + "\n;"):
+            return ExecutionResult(False, "Syntax error: incomplete input")
+
+        cache_key = (db_path, db_mtime, cleaned_sql, fetch_results)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
+        if conn is None:
+            result = self._execute(sql, cleaned_sql, db_path, fetch_results)
+        else:
+            result = self._execute_in_savepoint(conn, sql, cleaned_sql, db_path, fetch_results)
+        if self._is_cacheable(cleaned_sql, result):
+            self._cache_put(cache_key, result)
+        return result
+
+    def _cache_get(self, key: Tuple[str, float, str, bool]) -> Optional[ExecutionResult]:
+        """命中时将条目移到队尾（最近使用）并返回副本"""
+        if self.cache_size <= 0:
+            return None
+        with self._cache_lock:
+            result = self._cache.get(key)
+            if result is None:
+                return None
+            self._cache.move_to_end(key)
+        return result.copy()
+
+    def _cache_put(self, key: Tuple[str, float, str, bool], result: ExecutionResult):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = result.copy()
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _is_cacheable(cleaned_sql: str, result: ExecutionResult) -> bool:
+        """只缓存只读查询；超时/锁冲突是暂时性错误，不缓存以免污染后续验证"""
+        if not cleaned_sql[:6].upper().startswith(_READ_PREFIXES):
+            return False
+        return not (result.error_message and result.error_message.startswith("Execution timeout or database locked"))
+
+    def _new_connection(self, db_path: str) -> sqlite3.Connection:
+        """创建新的池化连接"""
+        conn = sqlite3.connect(db_path, timeout=self.timeout_seconds, check_same_thread=False)
+        self._init_connection(conn)
+        return conn
+
+    @staticmethod
+    def _init_connection(conn: sqlite3.Connection):
+        """
+        为只读验证设置PRAGMA，每个池化连接只执行一次。
+        query_only 防止SQL修改数据库；mmap 让读取直接命中操作系统页缓存。
+        不切换 WAL：journal_mode 会持久写入数据库文件并生成 -wal/-shm 文件，而验证从不写库。
+        外键约束只在写入时检查，只读验证无需开启 foreign_keys。
+        """
+        conn.executescript(_INIT_PRAGMAS)
+
+    def _get_pool(self, db_path: str) -> queue.Queue:
+        """取得 db_path 对应的连接池，必要时创建并淘汰最久未使用的池"""
+        with self._pools_lock:
+            pool = self._pools.get(db_path)
+            if pool is None:
+                pool = self._pools[db_path] = queue.Queue(maxsize=self.pool_size)
+                while len(self._pools) > self.max_pooled_dbs:
+                    _, evicted = self._pools.popitem(last=False)
+                    self._drain_pool(evicted)
+            else:
+                self._pools.move_to_end(db_path)
+            return pool
+
+    @staticmethod
+    def _drain_pool(pool: queue.Queue):
+        """关闭池中所有空闲连接"""
+        while True:
+            try:
+                conn = pool.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def _checkout(self, db_path: str) -> sqlite3.Connection:
+        """从连接池取出一个连接，池为空时新建"""
+        try:
+            return self._get_pool(db_path).get_nowait()
+        except queue.Empty:
+            return self._new_connection(db_path)
+
+    def _checkin(self, db_path: str, conn: sqlite3.Connection):
+        """回滚未结束的事务后归还连接；池已满或连接异常时直接关闭"""
+        try:
+            conn.rollback()
+            self._get_pool(db_path).put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def close(self):
+        """关闭所有池中的空闲连接"""
+        with self._pools_lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            self._drain_pool(pool)
+
+    def _execute(self, sql: str, cleaned_sql: str, db_path: str, fetch_results: bool) -> ExecutionResult:
+        """从连接池取连接执行已清理的SQL，用完归还"""
         start_time = time.time()
-        
         try:
-            # Connect to the database
-            conn = sqlite3.connect(db_path, timeout=self.timeout_seconds)
-            conn.execute("PRAGMA foreign_keys = ON;")  # Enable foreign key constraints
+            # Check out a pooled connection
+            conn = self._checkout(db_path)
+        except Exception as e:
+            return self._error_result(e, sql, db_path, start_time)
+        try:
+            return self._execute_on_conn(conn, sql, cleaned_sql, db_path, fetch_results, start_time)
+        finally:
+            self._checkin(db_path, conn)
+
+    def _execute_in_savepoint(self, conn: sqlite3.Connection, sql: str, cleaned_sql: str,
+                              db_path: str, fetch_results: bool) -> ExecutionResult:
+        """在共享连接上执行，SQL包在 SAVEPOINT 中并在结束后回滚，批量中的各条SQL互不影响"""
+        start_time = time.time()
+        try:
+            conn.execute("SAVEPOINT validate_sql")
+        except Exception as e:
+            return self._error_result(e, sql, db_path, start_time)
+        try:
+            return self._execute_on_conn(conn, sql, cleaned_sql, db_path, fetch_results, start_time)
+        finally:
+            try:
+                conn.execute("ROLLBACK TO validate_sql")
+                conn.execute("RELEASE validate_sql")
+            except sqlite3.Error:
+                conn.rollback()
+
+    def _execute_on_conn(self, conn: sqlite3.Connection, sql: str, cleaned_sql: str,
+                         db_path: str, fetch_results: bool, start_time: float) -> ExecutionResult:
+        """在给定连接上执行已清理的SQL，将各类异常转换为 ExecutionResult"""
+        cursor = None
+        try:
             cursor = conn.cursor()
 
-            # Clean and validate SQL
-            cleaned_sql = self._clean_sql(sql)
-            if not cleaned_sql:
-                return ExecutionResult(False, "SQL query is empty after cleaning")
+            # _clean_sql 已去除首尾空白，只需检查前6个字符；WITH ... SELECT 同样视为查询
+            is_read = cleaned_sql[:6].upper().startswith(_READ_PREFIXES)
+            count_rows = fetch_results and is_read
 
             # Execute the query with timeout handling
-            cursor.execute(cleaned_sql)
+            if not fetch_results and is_read:
+                # 只需判断能否执行：EXPLAIN 只解析、绑定并生成字节码，不扫描数据
+                cursor.execute("EXPLAIN " + cleaned_sql)
+            else:
+                # 计数时也执行原语句本身：外包 COUNT(*) 会被 SQLite 展平，
+                # 不再计算原 SELECT 列表中的表达式，从而掩盖其中的运行时错误
+                cursor.execute(cleaned_sql)
             
             execution_time = time.time() - start_time
             result_count = None
             
             # For SELECT queries, try to count results
-            if fetch_results and cleaned_sql.strip().upper().startswith('SELECT'):
+            if count_rows:
                 try:
-                    results = cursor.fetchall()
-                    result_count = len(results) if results else 0
-                    logger.debug(f"SQL executed successfully: {result_count} rows returned in {execution_time:.3f}s")
+                    # 分批取行只累加数量，数到 MAX_COUNT 即停，不把整个结果集搬进Python
+                    cursor.arraysize = 1024
+                    result_count = 0
+                    while result_count < self.MAX_COUNT:
+                        chunk = cursor.fetchmany()
+                        if not chunk:
+                            break
+                        result_count += len(chunk)
+                    result_count = min(result_count, self.MAX_COUNT)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("SQL executed successfully: %s rows returned in %.3fs", result_count, execution_time)
                 except sqlite3.Error:
                     # Some queries might not return fetchable results
                     logger.debug("Query executed but results not fetchable")
             else:
                 # For non-SELECT queries, just check if execution succeeded
-                logger.debug(f"SQL executed successfully in {execution_time:.3f}s")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("SQL executed successfully in %.3fs", execution_time)
 
             return ExecutionResult(True, None, result_count, execution_time)
 
-        except sqlite3.OperationalError as e:
-            error_msg = str(e).lower()
-            execution_time = time.time() - start_time
+        except Exception as e:
+            return self._error_result(e, sql, db_path, start_time)
             
-            if "timeout" in error_msg or "database is locked" in error_msg:
-                logger.debug(f"SQL execution timeout/lock for '{sql[:100]}...' on '{db_path}': {e}")
-                return ExecutionResult(False, f"Execution timeout or database locked: {e}", None, execution_time)
-            elif "syntax error" in error_msg or "near" in error_msg:
-                logger.debug(f"SQL syntax error for '{sql[:100]}...' on '{db_path}': {e}")
-                return ExecutionResult(False, f"Syntax error: {e}", None, execution_time)
-            elif "no such table" in error_msg or "no such column" in error_msg:
-                logger.debug(f"SQL schema error for '{sql[:100]}...' on '{db_path}': {e}")
-                return ExecutionResult(False, f"Schema error: {e}", None, execution_time)
-            else:
-                logger.debug(f"SQL operational error for '{sql[:100]}...' on '{db_path}': {e}")
-                return ExecutionResult(False, f"Operational error: {e}", None, execution_time)
+        finally:
+            if cursor is not None:
+                try:
+                    cursor.close()  # 结束未读完的语句，释放读锁
+                except sqlite3.Error:
+                    pass
+
+    @staticmethod
+    def _error_result(e: Exception, sql: str, db_path: str, start_time: float) -> ExecutionResult:
+        """将执行SQL时的异常分类转换为 ExecutionResult"""
+        execution_time = time.time() - start_time
+        if isinstance(e, sqlite3.OperationalError):
+            error_msg = str(e)
+            match = _OPERATIONAL_ERROR_RE.search(error_msg)
+            prefix, label = _OPERATIONAL_ERRORS[match.lastgroup if match else "operational"]
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("SQL %s for '%s...' on '%s': %s", label, sql[:100], db_path, error_msg)
+            return ExecutionResult(False, f"{prefix}: {error_msg}", None, execution_time)
                 
-        except sqlite3.IntegrityError as e:
-            execution_time = time.time() - start_time
-            logger.debug(f"SQL integrity error for '{sql[:100]}...' on '{db_path}': {e}")
+        if isinstance(e, sqlite3.IntegrityError):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("SQL integrity error for '%s...' on '%s': %s", sql[:100], db_path, e)
             return ExecutionResult(False, f"Integrity constraint violation: {e}", None, execution_time)
             
-        except sqlite3.Error as e:
-            execution_time = time.time() - start_time
-            logger.debug(f"SQL execution failed for '{sql[:100]}...' on '{db_path}': {e}")
+        if isinstance(e, sqlite3.Error):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("SQL execution failed for '%s...' on '%s': %s", sql[:100], db_path, e)
             return ExecutionResult(False, f"SQLite error: {e}", None, execution_time)
             
-        except Exception as e:
-            execution_time = time.time() - start_time
-            logger.error(f"Unexpected error during SQL execution for '{sql[:100]}...' on '{db_path}': {e}", exc_info=True)
-            return ExecutionResult(False, f"Unexpected error: {e}", None, execution_time)
-            
-        finally:
-            if conn:
-                try:
-                    conn.close()
-                except:
-                    pass
+        if logger.isEnabledFor(logging.ERROR):
+            logger.error("Unexpected error during SQL execution for '%s...' on '%s': %s",
+                         sql[:100], db_path, e, exc_info=e)
+        return ExecutionResult(False, f"Unexpected error: {e}", None, execution_time)
 
-    def _clean_sql(self, sql: str) -> str:
+    @staticmethod
+    def _clean_sql(sql: str) -> str:
         """
         清理SQL字符串，移除不必要的字符和格式。
         """
         if not sql:
             return ""
             
-        # Remove leading/trailing whitespace
-        cleaned = sql.strip()
+        # Remove common markdown formatting
+        cleaned = _FENCE_RE.sub("", sql)
         
         # Remove trailing semicolon if present
-        if cleaned.endswith(';'):
-            cleaned = cleaned[:-1].strip()
-        
-        # Remove common markdown formatting
-        if cleaned.startswith('```sql'):
-            cleaned = cleaned[6:].strip()
-        if cleaned.startswith('```'):
-            cleaned = cleaned[3:].strip()
-        if cleaned.endswith('```'):
-            cleaned = cleaned[:-3].strip()
+        cleaned = _TRAIL_SEMI_RE.sub("", cleaned)
             
         # Remove extra whitespace and normalize
-        cleaned = ' '.join(cleaned.split())
-        
-        return cleaned
+        return _WS_RE.sub(" ", cleaned).strip()
 
-    def validate_multiple(self, sqls: list, db_path: str) -> list:
+    def validate_multiple(self, sqls: list, db_path: str, validate_only: bool = True,
+                          max_workers: int = 8) -> list:
         """
-        批量验证多个SQL查询。
+        批量验证多个SQL查询。sqlite3 在执行语句时释放GIL，多线程可真正并行；
+        每个线程从连接池取各自的连接（连接为 query_only，无写冲突）。
         
         Args:
             sqls (list): SQL查询列表
             db_path (str): 数据库路径
+            validate_only (bool): 只检查能否执行（EXPLAIN），不统计结果行数
+            max_workers (int): 最大并发线程数，1 表示在单个连接上顺序验证
             
         Returns:
             list: ExecutionResult对象列表
         """
-        results = []
-        for i, sql in enumerate(sqls):
-            logger.debug(f"Validating SQL {i+1}/{len(sqls)}")
-            result = self.execute_sql(sql, db_path)
-            results.append(result)
-            
-        return results
+        workers = min(max_workers, len(sqls))
+        if workers <= 1:
+            return list(self.iter_validate(sqls, db_path, validate_only))
+        fetch_results = not validate_only
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as ex:
+            return list(ex.map(lambda sql: self.execute_sql(sql, db_path, fetch_results), sqls))
+
+    def validate_cross_db(self, items: List[Tuple[str, str]], validate_only: bool = True,
+                          max_workers: int = 8) -> List[ExecutionResult]:
+        """
+        并发验证分布在不同数据库上的SQL，结果顺序与输入一致。
+        
+        Args:
+            items (List[Tuple[str, str]]): (sql, db_path) 列表
+            validate_only (bool): 只检查能否执行（EXPLAIN），不统计结果行数
+            max_workers (int): 最大并发线程数
+        """
+        fetch_results = not validate_only
+        workers = min(max_workers, len(items))
+        if workers <= 1:
+            return [self.execute_sql(sql, db_path, fetch_results) for sql, db_path in items]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as ex:
+            return list(ex.map(lambda item: self.execute_sql(item[0], item[1], fetch_results), items))
+
+    def iter_validate(self, sqls: list, db_path: str, validate_only: bool = True) -> Iterator[ExecutionResult]:
+        """
+        逐条产出验证结果的生成器，批量很大时可降低峰值内存。
+        整批共用一个连接（PRAGMA 只设置一次，页缓存保持热），每条SQL在 SAVEPOINT 中执行后回滚。
+        
+        Args:
+            sqls (list): SQL查询列表
+            db_path (str): 数据库路径
+            validate_only (bool): 只检查能否执行（EXPLAIN），不统计结果行数
+        """
+        fetch_results = not validate_only
+        conn = None
+        if db_path and os.path.isfile(db_path):
+            try:
+                conn = self._checkout(db_path)
+            except sqlite3.Error:
+                conn = None  # 回退为逐条从连接池取连接，由 execute_sql 报告错误
+        debug = logger.isEnabledFor(logging.DEBUG)
+        try:
+            for i, sql in enumerate(sqls):
+                if debug:
+                    logger.debug("Validating SQL %d/%d", i + 1, len(sqls))
+                yield self._validate(sql, db_path, fetch_results, conn)
+        finally:
+            if conn is not None:
+                self._checkin(db_path, conn)
 
     def get_database_info(self, db_path: str) -> dict:
         """
@@ -182,32 +467,39 @@ class SQLValidator:
         Returns:
             dict: 数据库信息
         """
-        if not os.path.exists(db_path):
+        db_stat = _stat_db(db_path)
+        if db_stat is None:
             return {"error": f"Database file not found: {db_path}"}
             
         conn = None
         try:
-            conn = sqlite3.connect(db_path, timeout=5)
-            cursor = conn.cursor()
-            
-            # Get table names
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = [row[0] for row in cursor.fetchall()]
-            
             # Get database size
-            db_size = os.path.getsize(db_path)
+            db_size = db_stat[1]
             
-            info = {
-                "path": db_path,
-                "size_bytes": db_size,
-                "tables": tables,
-                "table_count": len(tables)
-            }
+            conn = self._checkout(db_path)
+            # schema_version 在表结构变化时递增；与文件大小一起判断缓存是否仍然有效
+            schema_version = conn.execute("PRAGMA schema_version;").fetchone()[0]
+            cached = _DBINFO_CACHE.get(db_path)
+            if cached is not None and cached[0] == schema_version and cached[1] == db_size:
+                info = cached[2]
+            else:
+                # Get table names
+                cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table';")
+                tables = [row[0] for row in cursor.fetchall()]
+                
+                info = {
+                    "path": db_path,
+                    "size_bytes": db_size,
+                    "tables": tables,
+                    "table_count": len(tables)
+                }
+                _DBINFO_CACHE[db_path] = (schema_version, db_size, info)
             
-            return info
+            # 返回副本，避免调用方修改缓存内容
+            return {**info, "tables": list(info["tables"])}
             
         except Exception as e:
             return {"error": f"Failed to get database info: {e}"}
         finally:
-            if conn:
-                conn.close()
\ No newline at end of file
+            if conn is not None:
+                self._checkin(db_path, conn)
\ No newline at end of file
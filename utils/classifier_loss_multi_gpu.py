@@ -1,28 +1,59 @@
 # utils/classifier_loss_multi_gpu.py
 import torch
 import torch.nn as nn
+from torch.nn.utils.rnn import pad_sequence
+
+def _focal_forward(input_tensor, target_tensor, alpha, gamma):
+    """逐项 focal loss（未归约，FP32）"""
+    # 直接取目标类别的 log 概率（即 -CE），避免 cross_entropy 之后再 exp(-ce) 的往返；
+    # 混合精度下的 FP16/BF16 logits 在 log_softmax 内部升到 FP32，损失与归约始终为 FP32
+    log_pt = nn.functional.log_softmax(input_tensor, dim=-1, dtype=torch.float32)
+    log_pt = log_pt.gather(-1, target_tensor.unsqueeze(-1)).squeeze(-1)
+    
+    # 计算pt
+    pt = log_pt.exp()
+    
+    # 计算alpha权重（二分类标签，正类取 alpha，负类取 1 - alpha）
+    alpha_t = torch.where(target_tensor.bool(), alpha, 1 - alpha)
+    
+    # 计算focal loss
+    return -alpha_t * (1 - pt).pow(gamma) * log_pt
+
+# 把 log_softmax/gather/exp/pow/mul 融合成少量 kernel；dynamic=True 避免项数变化导致重复编译
+if hasattr(torch, "compile"):
+    focal_forward = torch.compile(_focal_forward, dynamic=True)
+else:
+    focal_forward = _focal_forward
+
+# 编译后端失败（如缺少 C++ 编译器）时抛出的异常；旧版 torch 没有该类型时不捕获任何异常
+try:
+    from torch._dynamo.exc import BackendCompilerFailed
+except ImportError:
+    BackendCompilerFailed = ()
 
 class FocalLoss(nn.Module):
     def __init__(self, alpha=0.75, gamma=2.0):
         super(FocalLoss, self).__init__()
         self.alpha = alpha
         self.gamma = gamma
+        # 编译后端不可用时切换为 eager 实现，只影响当前实例
+        self._forward_fn = focal_forward
 
-    def forward(self, input_tensor, target_tensor):
+    def forward(self, input_tensor, target_tensor, reduction='mean'):
+        """reduction='none' 时返回逐项损失，供调用方自定义加权"""
         assert input_tensor.shape[0] == target_tensor.shape[0]
         
-        # 计算交叉熵损失
-        ce_loss = nn.functional.cross_entropy(input_tensor, target_tensor, reduction='none')
-        
-        # 计算pt
-        pt = torch.exp(-ce_loss)
-        
-        # 计算alpha权重
-        alpha_t = self.alpha * target_tensor + (1 - self.alpha) * (1 - target_tensor)
-        
-        # 计算focal loss
-        focal_loss = alpha_t * (1 - pt) ** self.gamma * ce_loss
+        try:
+            focal_loss = self._forward_fn(input_tensor, target_tensor, self.alpha, self.gamma)
+        except BackendCompilerFailed as e:
+            if self._forward_fn is _focal_forward:
+                raise
+            print(f"[WARN] torch.compile backend failed for focal loss, falling back to eager: {e}")
+            self._forward_fn = _focal_forward
+            focal_loss = self._forward_fn(input_tensor, target_tensor, self.alpha, self.gamma)
         
+        if reduction == 'none':
+            return focal_loss
         return focal_loss.mean()
 
 class ClassifierLossMultiGPU:
@@ -35,32 +66,39 @@ class ClassifierLossMultiGPU:
         batch_logits: (batch_size, max_items, 2)
         batch_labels: list of tensors
         batch_masks: (batch_size, max_items)
+        
+        每个样本取前 min(掩码项数, 标签数) 项，对齐和加权都用设备上的掩码完成，不做主机同步；
+        每项按 1/所属样本项数 加权，结果与逐样本求均值后再平均一致
         """
-        total_loss = 0.0
-        valid_samples = 0
+        batch_size, max_items = batch_logits.shape[:2]
+        labels_list = [batch_labels[i] if i < len(batch_labels) else None for i in range(batch_size)]
+        # 没有任何标签时直接返回挂在计算图上的零张量，保证调用方 backward() 不会出错
+        if all(labels is None for labels in labels_list):
+            return batch_logits.sum() * 0.0
         
-        batch_size = batch_logits.size(0)
-        for batch_id in range(batch_size):
-            mask = batch_masks[batch_id]
-            if mask.sum() == 0 or batch_id >= len(batch_labels) or batch_labels[batch_id] is None:
-                continue
-                
-            num_items = int(mask.sum().item())
-            logits = batch_logits[batch_id, :num_items, :]
-            labels = batch_labels[batch_id]
-            
-            if logits.size(0) != labels.size(0):
-                # 进一步处理大小不匹配
-                min_size = min(logits.size(0), labels.size(0))
-                logits = logits[:min_size]
-                labels = labels[:min_size]
-            
-            if logits.size(0) > 0:
-                loss = self.focal_loss(logits, labels)
-                total_loss += loss
-                valid_samples += 1
+        device = batch_logits.device
+        # 标签长度取自张量形状，无需同步；有效项数留在设备上，与标签长度取较小者
+        label_lens = torch.tensor(
+            [labels.size(0) if labels is not None else 0 for labels in labels_list], device=device
+        )
+        lengths = torch.minimum(batch_masks.sum(dim=1).long(), label_lens)
+        select = torch.arange(max_items, device=device).unsqueeze(0) < lengths.unsqueeze(1)
+        
+        # 标签补齐到 (batch_size, max_items)，补齐位置由 select 屏蔽
+        empty = torch.zeros(0, dtype=torch.long, device=device)
+        padded_labels = pad_sequence(
+            [labels if labels is not None else empty for labels in labels_list], batch_first=True
+        )[:, :max_items]
+        if padded_labels.size(1) < max_items:
+            padded_labels = nn.functional.pad(padded_labels, (0, max_items - padded_labels.size(1)))
         
-        return total_loss / max(valid_samples, 1)
+        # 无效位置的 logits 置零，避免其中的 inf/nan 经 0 权重传出 nan 梯度
+        logits = batch_logits.masked_fill(~select.unsqueeze(-1), 0)
+        item_losses = self.focal_loss(logits, padded_labels, reduction='none')
+        
+        weights = select / lengths.clamp(min=1).unsqueeze(1)
+        valid_samples = (lengths > 0).sum().clamp(min=1)
+        return (item_losses * weights).sum() / valid_samples
 
     def compute_loss(self, model_outputs, batch_table_labels, batch_column_labels):
         """
@@ -98,8 +136,7 @@ class ClassifierLossMultiGPU:
         """
         传统的批处理损失计算（用于回退）
         """
-        total_loss = 0.0
-        valid_samples = 0
+        losses = []
         
         for batch_id, logits in enumerate(batch_logits_list):
             if logits is None or batch_id >= len(batch_labels) or batch_labels[batch_id] is None:
@@ -112,8 +149,12 @@ class ClassifierLossMultiGPU:
                 labels = labels[:min_size]
             
             if logits.size(0) > 0:
-                loss = self.focal_loss(logits, labels)
-                total_loss += loss
-                valid_samples += 1
+                losses.append(self.focal_loss(logits, labels))
+        
+        if losses:
+            # 一次 stack + mean 归约，代替逐样本累加
+            return torch.stack(losses).mean()
         
-        return total_loss / max(valid_samples, 1)
\ No newline at end of file
+        # 没有有效样本时返回零张量（尽量挂在 logits 的计算图上）
+        anchor = next((logits for logits in batch_logits_list if logits is not None), None)
+        return anchor.sum() * 0.0 if anchor is not None else torch.zeros(())
\ No newline at end of file